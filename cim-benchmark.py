@@ -0,0 +1,371 @@
+#! python3
+# cim-benchmark.py
+
+"""
+This program measures how fast the other programs in this repository
+    are, so that a change can be checked for whether it makes them faster
+    or slower. It is meant for people changing the programs rather than
+    for people using them.
+
+It does two things:
+(1) It makes up documents of several sizes out of random words, with
+    copies of cim_core.sample_text mixed in at several densities, and
+    measures how many megabytes per second the matching functions in
+    cim_core.py can check.
+(2) It starts a small web server on this computer that serves made-up
+    documents, with a delay before each response and some responses
+    failing on purpose, then runs a copy of cim-scraper.py against it
+    with each of several combinations of settings and measures how many
+    pages per second it checks. This part needs the requests module,
+    like cim-scraper.py itself.
+
+The results are saved as a JSON file. To compare them with an earlier
+    run--for example, one from before a change--run the program from the
+    command line with "--compare" followed by the earlier JSON file. The
+    program then also shows how much faster or slower each measurement
+    was.
+
+Instructions:
+(1) Edit this script to indicate where you want the JSON file to be saved,
+    by editing the variable destination_path between the long lines of
+    hashes. The other variables between the long lines of hashes are
+    optional settings that can be left as they are.
+
+(2) Run the program. Close other programs first for steadier results."""
+
+# Import libraries.
+import csv
+import datetime
+import glob
+import http.server
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from cim_core import (MatchScanner, check_matches, find_matches,
+                      find_matches_in_bytes, find_matches_in_file, get_title,
+                      get_title_from_bytes, sample_text)
+
+########################################################################
+# Specify variables.
+
+# Specify the destination path. This is the folder to which the JSON file
+    # will be saved. Replace only what is between the quotation marks, not
+    # the "r" that precedes them.
+destination_path = r"C:\Users\rastley\Documents"
+
+# Optional: Specify the sizes of the made-up documents for measuring the
+    # matching functions, in characters, not counting the copies of
+    # sample_text.
+document_sizes = [10000, 1000000, 10000000]
+
+# Optional: Specify how many copies of sample_text to mix into every
+    # 100,000 characters of each made-up document.
+hit_densities = [0, 1, 10]
+
+# Optional: Specify how many times to time each measurement. The fastest
+    # time is kept, since slower times are usually caused by other
+    # programs.
+repeats = 3
+
+# Optional: Specify how many URLs to give cim-scraper.py, and the size and
+    # density of the made-up page at each one.
+scraper_urls = 200
+page_size = 100000
+page_density = 1
+
+# Optional: Specify how many seconds the web server waits before each
+    # response, and what fraction of the responses fail on purpose.
+server_latency = 0.05
+server_error_rate = 0.05
+
+# Optional: Specify the combinations of settings to run cim-scraper.py
+    # with. Settings that are not listed are left as they are in
+    # cim-scraper.py, except that every run checks URLs concurrently and
+    # does not use the cache or remember pages by content. (Checking URLs
+    # one at a time would mostly measure the pause after each URL, and
+    # since the server sends the same handful of pages over and over,
+    # remembering them would skip checking almost all of them.)
+scraper_settings = [{"max_concurrent_requests": 10},
+                    {"max_concurrent_requests": 10, "parse_workers": 2},
+                    {"max_concurrent_requests": 10, "stream_pages": True}]
+########################################################################
+
+# Find cim-scraper.py, which is in the same folder as this program.
+program_folder = os.path.dirname(os.path.abspath(__file__))
+scraper_path = os.path.join(program_folder, "cim-scraper.py")
+
+# List the words to make up documents from. Some of them are close to the
+    # terms being looked for without matching them.
+filler_words = ("the of and to in a is that for as with by on at from "
+                "program programs student students career careers medical "
+                "medicine school residency physician cinema claim medcare "
+                "Careers Medicine CI MED").split()
+
+"""
+This function makes up an HTML document with about size characters of
+    random words and hits_per_100k copies of sample_text for every
+    100,000 of those characters. The same seed always gives the same
+    document."""
+def make_document(size, hits_per_100k, seed):
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(filler_words)
+        words.append(word)
+        length += len(word) + 1
+    # Put each copy of sample_text between two random words.
+    for i in range(round(size * hits_per_100k / 100000)):
+        words.insert(rng.randrange(len(words) + 1), sample_text)
+    return ("<html><head><title>Made-up document " + str(seed) +
+            "</title></head><body><p>" + " ".join(words) +
+            "</p></body></html>")
+
+"""
+This function runs a function repeats times and returns the fastest time
+    in seconds."""
+def best_time(function, *args):
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+"""
+This function checks text with MatchScanner 64 KB at a time, the way
+    cim-scraper.py does when stream_pages is True."""
+def scan_in_chunks(text):
+    scanner = MatchScanner()
+    for i in range(0, len(text), 65536):
+        scanner.feed(text[i:i + 65536])
+    return scanner.close()
+
+"""
+This function measures each matching function on each made-up document
+    and returns a list with a dictionary for each measurement."""
+def benchmark_matcher():
+    results = []
+    folder = tempfile.mkdtemp(prefix = "cim-benchmark_")
+    for size in document_sizes:
+        for density in hit_densities:
+            text = make_document(size, density, seed = size + density)
+            megabytes = len(text.encode("utf-8")) / 1000000
+            path = os.path.join(folder, "document.html")
+            with open(path, "w", encoding = "utf-8") as file:
+                file.write(text)
+            functions = [("find_matches", find_matches, text),
+                         ("check_matches",
+                          lambda text: check_matches(text, {}), text),
+                         ("MatchScanner", scan_in_chunks, text),
+                         ("find_matches_in_bytes", find_matches_in_bytes,
+                          text.encode("utf-8")),
+                         ("find_matches_in_file", find_matches_in_file,
+                          path),
+                         ("get_title", get_title, text),
+                         ("get_title_from_bytes", get_title_from_bytes,
+                          text.encode("utf-8"))]
+            for name, function, argument in functions:
+                seconds = best_time(function, argument)
+                results.append({"Function": name,
+                                "Size": size,
+                                "Hits per 100K": density,
+                                "Megabytes": round(megabytes, 3),
+                                "Seconds": round(seconds, 6),
+                                "Megabytes per Second":
+                                    round(megabytes / seconds, 2)})
+                print(f"{name:<22}{size:>10,} characters, {density:>3} "
+                      f"hits per 100K: {megabytes / seconds:9.2f} MB/s")
+            os.remove(path)
+    os.rmdir(folder)
+    return results
+
+"""
+This class answers requests for made-up pages. The last part of the path
+    is the page number. Each response is delayed by server_latency
+    seconds, and a server_error_rate fraction of the pages always fail
+    with a 500 error."""
+class BenchmarkHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(server_latency)
+        try:
+            number = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            self.send_error(404)
+            return
+        if random.Random(number).random() < server_error_rate:
+            self.send_error(500)
+            return
+        body = self.server.pages[number % len(self.server.pages)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Keep the server from printing a line for every request.
+    def log_message(self, format, *args):
+        pass
+
+"""
+This function starts the web server in the background and returns it.
+    The server picks a free port, which is server.server_port."""
+def start_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                             BenchmarkHandler)
+    server.daemon_threads = True
+    # Make a handful of different pages to serve in turn.
+    server.pages = [make_document(page_size, page_density, seed).encode(
+        "utf-8") for seed in range(10)]
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
+
+"""
+This function saves a copy of cim-scraper.py in folder with the settings
+    changed to the ones given, and returns the path of the copy."""
+def configure_scraper(folder, settings):
+    with open(scraper_path, encoding = "utf-8", newline = "") as file:
+        code = file.read()
+    for name, value in settings.items():
+        code, count = re.subn(r"^" + name + r" = [^\r\n]*",
+                              lambda match: name + " = " + repr(value),
+                              code, count = 1, flags = re.MULTILINE)
+        if count != 1:
+            raise ValueError(f"cim-scraper.py has no setting {name}.")
+    path = os.path.join(folder, "cim-scraper.py")
+    with open(path, "w", encoding = "utf-8", newline = "") as file:
+        file.write(code)
+    return path
+
+"""
+This function runs a copy of cim-scraper.py against the web server with
+    each combination of settings in scraper_settings and returns a list
+    with a dictionary for each run."""
+def benchmark_scraper():
+    results = []
+    server = start_server()
+    for extra_settings in scraper_settings:
+        folder = tempfile.mkdtemp(prefix = "cim-benchmark_")
+        with open(os.path.join(folder, "urls.csv"), "w", newline = "",
+                  encoding = "utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["URL"])
+            for number in range(scraper_urls):
+                writer.writerow([f"http://127.0.0.1:{server.server_port}"
+                                 f"/page/{number}"])
+        settings = {"source_path": folder,
+                    "source_csv": "urls.csv",
+                    "destination_path": folder,
+                    "cache_path": os.path.join(folder, "cache"),
+                    "use_cache": False,
+                    "content_memory_size": 0,
+                    "check_concurrently": True}
+        settings.update(extra_settings)
+        path = configure_scraper(folder, settings)
+        # Let the copy find cim_core.py in this program's folder.
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = os.pathsep.join(
+            [program_folder] + [environment.get("PYTHONPATH", "")])
+        start = time.perf_counter()
+        run = subprocess.run([sys.executable, path], cwd = folder,
+                             env = environment, capture_output = True,
+                             text = True)
+        seconds = time.perf_counter() - start
+        result = {"Settings": extra_settings,
+                  "URLs": scraper_urls,
+                  "Seconds": round(seconds, 3),
+                  "Pages per Second": round(scraper_urls / seconds, 2)}
+        if run.returncode != 0:
+            result["Error"] = run.stderr.strip().splitlines()[-1:]
+        else:
+            # Count the responses in the output, to check that the run
+                # checked every page and that the failures were the ones
+                # the server caused.
+            responses = {}
+            for output in glob.glob(os.path.join(folder, "cim-matches_*")):
+                with open(output, encoding = "utf-8-sig") as file:
+                    for row in csv.DictReader(file):
+                        response = row["Scrape Response"]
+                        responses[response] = responses.get(response, 0) + 1
+            result["Responses"] = responses
+        results.append(result)
+        print(f"cim-scraper.py {json.dumps(extra_settings)}: "
+              f"{result['Pages per Second']:.2f} pages per second")
+    server.shutdown()
+    return results
+
+"""
+This function returns the current Git commit of this program's folder, or
+    None if it is not a Git repository or Git is not installed."""
+def git_commit():
+    try:
+        run = subprocess.run(["git", "rev-parse", "HEAD"],
+                             cwd = program_folder, capture_output = True,
+                             text = True)
+    except OSError:
+        return None
+    if run.returncode != 0:
+        return None
+    return run.stdout.strip()
+
+"""
+This function shows how much faster or slower each measurement in results
+    was than the same measurement in an earlier JSON file."""
+def compare(results, earlier_json):
+    with open(earlier_json, encoding = "utf-8") as file:
+        earlier = json.load(file)
+    print()
+    print(f"Compared with {earlier_json} (commit {earlier.get('Commit')}):")
+    earlier_matcher = {(row["Function"], row["Size"], row["Hits per 100K"]):
+                       row for row in earlier.get("Matcher", [])}
+    for row in results["Matcher"]:
+        key = (row["Function"], row["Size"], row["Hits per 100K"])
+        if key in earlier_matcher:
+            change = (row["Megabytes per Second"] /
+                      earlier_matcher[key]["Megabytes per Second"] - 1)
+            print(f"{key[0]:<21}{key[1]:>10,} characters, {key[2]:>3} hits "
+                  f"per 100K: {change:+.1%}")
+    earlier_scraper = {json.dumps(row["Settings"], sort_keys = True): row
+                       for row in earlier.get("Scraper", [])}
+    for row in results["Scraper"]:
+        key = json.dumps(row["Settings"], sort_keys = True)
+        if key in earlier_scraper:
+            change = (row["Pages per Second"] /
+                      earlier_scraper[key]["Pages per Second"] - 1)
+            print(f"cim-scraper.py {key}: {change:+.1%}")
+
+def main():
+    results = {"Started": datetime.datetime.now().isoformat(
+                   timespec = "seconds"),
+               "Commit": git_commit(),
+               "Python": platform.python_version(),
+               "Platform": platform.platform(),
+               "Processors": os.cpu_count()}
+    print("Measuring the matching functions...")
+    results["Matcher"] = benchmark_matcher()
+    print()
+    print("Measuring cim-scraper.py...")
+    results["Scraper"] = benchmark_scraper()
+
+    # Name the output file and save the results.
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    output_json = os.path.join(destination_path,
+                               f"cim-benchmark_{timestamp}.json")
+    with open(output_json, "w", encoding = "utf-8") as file:
+        json.dump(results, file, indent = 4)
+    print()
+    print(f"The results are in {output_json}.")
+
+    if "--compare" in sys.argv[1:]:
+        compare(results, sys.argv[sys.argv.index("--compare") + 1])
+
+if __name__ == "__main__":
+    main()
@@ -3,211 +3,220 @@
 
 """
 This program finds possible references to AAMC's Careers in Medicine
-    program on the clipboard."""
+    program on the clipboard.
+
+It can either check the clipboard each time you press "Enter," or watch
+    the clipboard and check text automatically each time you copy
+    something new. To start in watch mode, type "w" at the first prompt,
+    or run the program from the command line with "--watch". Press
+    Ctrl+C to stop watching.
+
+The program remembers the results for texts it has already checked, so
+    copying the same text again shows its results right away. At the
+    end, it can save a summary of the matches from every text checked
+    during the session as a CSV file."""
 
 # Import libraries.
-import pandas as pd
+import collections
+import csv
+import hashlib
+import sys
+import time
+
 import pyperclip
-import re
-from tabulate import tabulate
+
+from cim_core import find_matches, print_results
+
+# Specify how many seconds to wait between looks at the clipboard in
+    # watch mode.
+poll_interval = 0.05
+
+# Specify how many texts to remember the results for.
+max_remembered = 256
+
+# Create a dictionary to remember results in, keyed by a hash of each
+    # text, so that the texts themselves do not need to be kept.
+remembered = collections.OrderedDict()
+
+# Create dictionaries to keep a running total, for each type of match, of
+    # how many times each match appeared and in how many texts, plus a set
+    # of the hashes of the texts that have been added to the totals.
+session_counts = {"More Likely": collections.Counter(),
+                  "Possible": collections.Counter(),
+                  "Unlikely": collections.Counter()}
+session_texts = {"More Likely": collections.Counter(),
+                 "Possible": collections.Counter(),
+                 "Unlikely": collections.Counter()}
+session_hashes = set()
 
 """
-This function goes through all items on a list, and leading and trailing
-    whitespace, removes leading and trailing non-letter characters, and
-    adds the stripped item to a new list."""
-def strip_list(old_list, new_list):
-    for i in old_list:
-        # Remove leading and trailing whitespace.
-        i_1 = i.strip()
-        # If the first character is not a letter, remove it.
-        if i_1[0].isalpha() == False:
-            i_2 = i_1[1:]
-        else:
-            i_2 = i_1
-        # If the last character is not a letter, remove it.
-        if i_2[-1].isalpha() == False:
-            i_3 = i_2[:-1]
-        else:
-            i_3 = i_2
-        new_list.append(i_3)     
-
-# Create regular expressions to identify more likely, possible, and
-    # unlikely true positives. Some groups are split into multiple
-    # regular expressions (a) to make it easier to deal with some
-    # matches requiring case sensitivity and others not, (b) to conform
-    # to PEP 8 guidelines regarding line length, and (c) to make the
-    # code easier to read.
-more_likely_re_1 = re.compile(r"Careers in Medicine|\WCiM\W")
-more_likely_re_2 = re.compile(r"medcar{1,2}e{1,2}rs", re.IGNORECASE)
-possible_re = re.compile(
-    r"Careers In Medicine|\Wcim\W|\WCIM\W|CAREERS IN MEDICINE")
-unlikely_re_1 = re.compile(r"[cC]areers in medicine")
-unlikely_re_2 = re.compile(r"career in", re.IGNORECASE)
-
-# Create sample text with which to test the regular expressions.
-sample_text = ("AAMC has a program called called Careers in " +
-               "Medicine, which is abbreviated \"CiM.\" \"CiM\"" + 
-               "sometimes appears between parentheses (CiM). " +
-               "Sometimes the name is rendered with a capitalized " +
-               "\"I,\" as in \"Careers In Medicine\" (CIM [CIM]). " +
-               "Some texts may use all capitals, shouting, " +
-               "\"CAREERS IN MEDICINE\"! The program used to be " +
-               "called MEDcareers or MedCAREERS or medCAREERS or " +
-               "medCareers or MEDCAREERS, or maybe even medcareers. " +
-               "One of those iterations was official, but people " +
-               "don't always write it that way (similar to how " +
-               "people write \"American Association of Medical " +
-               "Colleges\" instead of \"Association of American " +
-               "Medical Colleges\"). I think I've even seen " +
-               "something like \"Medcarrers\" in a non-English " +
-               "language text. Also, some search engines try to be " +
-               "helpful by including near matches, such as \"career " +
-               "in medicine,\" or even \"career in academic " +
-               "medicine.\" To be fair, this kind of thing is " +
-               "generally helpful--it just so happens that this is " +
-               "one of the cases where the near match is almost " +
-               "certainly a false positive. Similarly, search engines" +
-               "tend to be case insensitive, which is usually " +
-               "helpful--with CiM, however, it leads to many false " +
-               "positives, as many people talk about careers in " +
-               "medicine without referring to the AAMC program.")
-
-# Establish a variable to keep track of how many texts have been
-    # checked.
-n = 0
-
-# Introduce the program.
-print("Welcome. This program checks text you have copied for possible")
-print("    references to AAMC's Careers in Medicine program.")
-
-# Print a blank line for readability.
-print()
-
-# Provide instructions.
-print("Copy the text you want to check. Then, press \"Enter\" in this")
-print("    program to check it.")
-
-response = input()
-
-# Start a loop in which every time the user presses "Enter," the program
-    # checks the text on the clipboard.
-
-while response == "":
-    # Assign text in the clipboard to a variable.
-    text = str(pyperclip.paste())
-
-    # Check the text for each of the regular expressions.
-    more_likelies_1 = more_likely_re_1.findall(text)
-    more_likelies_2 = more_likely_re_2.findall(text)
-    possibles = possible_re.findall(text)
-    unlikelies_1 = unlikely_re_1.findall(text)
-    unlikelies_2 = unlikely_re_2.findall(text)
-
-    # Merge the regular expression match lists where there were multiple
-        # regular expressions for the same type of match.
-    more_likelies = more_likelies_1 + more_likelies_2
-    unlikelies = unlikelies_1 + unlikelies_2
-
-    # Create lists to which to add stripped matches.
-    stripped_more_likelies = []
-    stripped_possibles = []
-    stripped_unlikelies = []
-
-    # Strip each list.
-    strip_list(more_likelies, stripped_more_likelies)
-    strip_list(possibles, stripped_possibles)
-    strip_list(unlikelies, stripped_unlikelies)
-
-    # Remove duplicates from each list.
-    more_likelies_set_list = sorted(set(stripped_more_likelies),
-                                    key = str.casefold)
-    possibles_set_list = sorted(set(stripped_possibles), key = str.casefold)
-    unlikelies_set_list = sorted(set(stripped_unlikelies), key = str.casefold)
-
-    # Create a list to which to add dictionaries for the more likely
-        # matches. The dictionaries will indicate how many times each
-        # term appeared.
-    more_likelies_dicts = []
-    # Count how many times each term appeared.
-    for item in more_likelies_set_list:
-        more_likelies_dicts.append({
-            "Match": item,
-            "Count": stripped_more_likelies.count(item)})
-    # Create a dataframe out of the list of dictionaries.
-    if len(more_likelies_dicts) > 0:
-        more_likelies_df = pd.DataFrame(more_likelies_dicts).sort_values(
-            by = ["Count"], ascending = False)
-
-    # Create a list to which to add dictionaries for the possible
-        # matches.
-    possibles_dicts = []
-    # Count how many times each term appeared.
-    for item in possibles_set_list:
-        possibles_dicts.append({
-            "Match": item,
-            "Count": stripped_possibles.count(item)})
-    # Create a dataframe out of the list of dictionaries.
-    if len(possibles_dicts) > 0:
-        possibles_df = pd.DataFrame(possibles_dicts)
-
-    # Create a list to which to add dictionaries for the unlikely
-        # matches.
-    unlikelies_dicts = []
-    # Count how many times each term appeared.
-    for item in unlikelies_set_list:
-        unlikelies_dicts.append({
-            "Match": item,
-            "Count": stripped_unlikelies.count(item)})
-    # Create a dataframe out of the list of dictionaries.
-    if len(unlikelies_dicts) > 0:
-        unlikelies_df = pd.DataFrame(unlikelies_dicts)
-
-    # Display the existing dataframes.
-    print("More Likely True Positives: " +
-          str(len(more_likelies)).rjust(3))
-    if len(more_likelies_dicts) > 0:
-        print(tabulate(more_likelies_df, headers = "keys", tablefmt = "psql",
-                       showindex = False))
-    print()
-    print("Possible True Positives: " +
-          str(len(possibles)).rjust(6))
-    if len(possibles_dicts) > 0:
-        print(tabulate(possibles_df, headers = "keys", tablefmt = "psql",
-                       showindex = False))
-    print()
-    print("Probable FALSE Positives: " +
-          str(len(unlikelies)).rjust(5))
-    if len(unlikelies_dicts) > 0:
-        print(tabulate(unlikelies_df, headers = "keys", tablefmt = "psql",
-                       showindex = False))
+This function checks a text for matches. If the same text was checked
+    recently, it returns the results from then instead of checking it
+    again. It returns the hash of the text and the matches."""
+def check_text(text):
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+    if digest in remembered:
+        remembered.move_to_end(digest)
+        return digest, remembered[digest]
+    matches = find_matches(text)
+    remembered[digest] = matches
+    # Forget the oldest results once there are too many.
+    if len(remembered) > max_remembered:
+        remembered.popitem(last = False)
+    return digest, matches
 
-    # Add one to the variable counting how many texts the program has
-        # checked.
-    n += 1
+"""
+This function adds the matches for a text to the running totals for the
+    session. Each distinct text is only added once, however many times it
+    is checked."""
+def add_to_session(digest, matches):
+    if digest in session_hashes:
+        return
+    session_hashes.add(digest)
+    for tier, items in matches.items():
+        counts = collections.Counter(items)
+        session_counts[tier].update(counts)
+        session_texts[tier].update(counts.keys())
+
+"""
+This function saves the running totals for the session as a CSV file,
+    with one row for each distinct match."""
+def export_session(filename):
+    if not filename.lower().endswith(".csv"):
+        filename += ".csv"
+    with open(filename, "w", encoding = "utf-8-sig", newline = "") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Type", "Match", "Count", "Texts"])
+        for tier, counts in session_counts.items():
+            for item, count in counts.most_common():
+                writer.writerow([tier, item, count,
+                                 session_texts[tier][item]])
+    print("Saved a summary of " + str(len(session_hashes)) +
+          " distinct texts to " + filename + ".")
 
-    # Print a row of asterisks to make it easier to see when a new text
-        # has been entered.
-    print("*"*72)
-    
-    # Report how many texts the user has checked.
+"""
+This function checks a text, displays the results, and adds them to the
+    running totals for the session."""
+def check_and_print(text):
+    digest, matches = check_text(text)
+    add_to_session(digest, matches)
+    print_results(matches)
+
+"""
+This function prints how many texts the user has checked."""
+def print_count(n):
     if n == 1:
         print("You have checked 1 text.")
     else:
         print("You have checked " + str(n) + " texts.")
-    
-    # Provide instructions to check more texts or finish the program.
-    print("To test more text, copy it, then press \"Enter\" again in this")
-    print("    program.")
-    print("If you are finished, type anything and press \"Enter.\"")
-
-    # Print a row of asterisks to make it easier to see when a new text
-        # has been entered.
-    print("*"*72)
-    response = input()
-
-print()
-print("Thank you for using this program.")
-print("You checked " + str(n) + " texts.")
-print("Press \"Enter\" to end the program.")
-
-close = input()
+
+"""
+This function watches the clipboard and checks its text every time it
+    changes, until the user presses Ctrl+C. It returns how many texts it
+    checked."""
+def watch():
+    n = 0
+    print("Watching the clipboard. Copy text to check it. Press Ctrl+C when")
+    print("    you are finished.")
+    last_text = None
+    try:
+        while True:
+            text = str(pyperclip.paste())
+            # Skip the text if it has not changed since the last look.
+            if text == last_text or text == "":
+                time.sleep(poll_interval)
+                continue
+            last_text = text
+            check_and_print(text)
+            n += 1
+            # Print a row of asterisks to make it easier to see when a new
+                # text has been checked.
+            print("*"*72)
+            print_count(n)
+            print("Copy more text to check it, or press Ctrl+C if you are")
+            print("    finished.")
+            print("*"*72)
+    except KeyboardInterrupt:
+        pass
+    return n
+
+"""
+This function runs the program."""
+def main():
+    # Establish a variable to keep track of how many texts have been
+        # checked.
+    n = 0
+
+    # Introduce the program.
+    print("Welcome. This program checks text you have copied for possible")
+    print("    references to AAMC's Careers in Medicine program.")
+
+    # Print a blank line for readability.
+    print()
+
+    if "--watch" in sys.argv[1:]:
+        response = "w"
+    else:
+        # Provide instructions.
+        print("Copy the text you want to check. Then, press \"Enter\" in "
+              "this")
+        print("    program to check it.")
+        print("Or, type \"w\" and press \"Enter\" to have the program check")
+        print("    text automatically every time you copy it.")
+
+        response = input()
+
+    if response.strip().lower() == "w":
+        n = watch()
+
+    # Start a loop in which every time the user presses "Enter," the
+        # program checks the text on the clipboard.
+
+    while response == "":
+        # Assign text in the clipboard to a variable.
+        text = str(pyperclip.paste())
+
+        # Check the text and display the matches.
+        check_and_print(text)
+
+        # Add one to the variable counting how many texts the program has
+            # checked.
+        n += 1
+
+        # Print a row of asterisks to make it easier to see when a new
+            # text has been entered.
+        print("*"*72)
+
+        # Report how many texts the user has checked.
+        print_count(n)
+
+        # Provide instructions to check more texts or finish the program.
+        print("To test more text, copy it, then press \"Enter\" again in "
+              "this")
+        print("    program.")
+        print("If you are finished, type anything and press \"Enter.\"")
+
+        # Print a row of asterisks to make it easier to see when a new
+            # text has been entered.
+        print("*"*72)
+        response = input()
+
+    print()
+    print("Thank you for using this program.")
+    print("You checked " + str(n) + " texts.")
+
+    # Offer to save a summary of the session.
+    if session_hashes:
+        print("To save a summary of the matches from this session as a CSV")
+        print("    file, type a file name and press \"Enter.\" Otherwise,")
+        print("    just press \"Enter.\"")
+        filename = input().strip()
+        if filename:
+            export_session(filename)
+
+    print("Press \"Enter\" to end the program.")
+
+    close = input()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#! python3
+# cim-columns.py
+
+"""
+This program checks text that is already in a CSV file--such as the
+    titles and abstracts in an export from a bibliographic database--for
+    references to AAMC's Careers in Medicine program (CiM). It looks for
+    the same text strings as cim-scraper.py and adds the same six columns
+    of matches to each row, but instead of visiting a webpage for each
+    row, it checks the text in one or more columns of the CSV file.
+
+Rather than checking one row at a time, the program checks a whole
+    column of rows at once with pandas. If the pyarrow module is installed,
+    it first finds the rows with any matches using pyarrow, which is many
+    times faster than checking each row with Python's regular expressions,
+    and then checks only those rows in full. It reads the CSV file a chunk
+    of rows at a time, so that even a file with millions of rows does not
+    need to fit in memory, and writes each chunk to the output CSV file as
+    soon as it has been checked.
+
+The text columns of each row are checked together, as if each were a
+    separate paragraph, so a term at the very beginning or end of a column
+    is found even if nothing comes before or after it.
+
+Instructions:
+(1) Save the CSV file with UTF-8 encoding. The first row needs to include
+    the field names (column names).
+
+(2) Edit this script to indicate the name of the CSV file, where it is
+    saved, where you want the output CSV file to be saved, and which
+    columns to check. Users will need to edit only four lines of code, all
+    located between the long lines of hashes. Specifically, they will
+    need to edit the variables source_path, source_csv, destination_path,
+    and text_columns to reflect the correct information. The other
+    variable between the long lines of hashes is an optional setting that
+    can be left as it is."""
+
+# Import libraries.
+import datetime
+import os
+import re
+
+import pandas as pd
+# pyarrow is optional. Without it, the program is slower but gives the
+    # same results.
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from cim_core import combined_re, tiered_res, tiers
+
+########################################################################
+# Specify variables.
+# I recommend using folders on a hard drive. While this program should
+    # work on a network drive, it may take longer.
+
+# Specify the source path. This is the folder where the CSV file is saved.
+    # Replace only what is between the quotation marks, not the "r" that
+    # precedes them.
+source_path = r"C:\Users\rastley\Documents"
+
+# Specify the name of the CSV file, including the extension.
+source_csv = "database_export.csv"
+
+# Specify the destination path. This is the folder to which the output
+    # will be saved. Replace only what is between the quotation marks, not
+    # the "r" that precedes them.
+destination_path = r"C:\Users\rastley\Documents"
+
+# Specify the names of the columns to check.
+text_columns = ["Title", "Abstract"]
+
+# Optional: Specify how many rows to read and check at a time. Larger
+    # numbers are a little faster but use more memory.
+rows_per_chunk = 50000
+########################################################################
+
+# List the columns this program adds to each row.
+match_fields = ["Number of More Likely Matches",
+                "More Likely Matches",
+                "Number of Possible Matches",
+                "Possible Matches",
+                "Number of Unlikely Matches",
+                "Unlikely Matches"]
+
+# Create one regular expression that matches wherever any of the regular
+    # expressions matches, for pyarrow to find the rows with matches.
+    # pyarrow uses a different kind of regular expressions, in which \W
+    # matches more characters than in Python (every character other than
+    # an English letter, a digit, or an underscore) and \b, \B, \w, \d,
+    # and \s match fewer. A row that has a match in Python can then only
+    # be missed if one of the latter is used, so pyarrow is not used if
+    # any of them appears.
+any_pattern = "|".join(
+    "(?" + "".join(flag for flag, value in [("i", re.IGNORECASE),
+                                            ("m", re.MULTILINE),
+                                            ("s", re.DOTALL),
+                                            ("x", re.VERBOSE)]
+                   if regex.flags & value) + ":" + regex.pattern + ")"
+    for tier, regex in tiered_res)
+use_pyarrow = (pyarrow is not None and
+               re.search(r"\\[bBwds]", any_pattern) is None)
+
+"""
+This function returns a column that is True for each text in a column
+    that has at least one match and False for the others."""
+def has_matches(texts):
+    if use_pyarrow:
+        try:
+            return texts.astype("string[pyarrow]").str.contains(any_pattern)
+        # pyarrow cannot handle some regular expressions, such as ones
+            # that look ahead. Check those with Python instead.
+        except pyarrow.ArrowInvalid:
+            pass
+    return texts.map(combined_re.search).notna()
+
+"""
+This function finds every match for a regular expression in each text of
+    a column, the same way findall does, and returns a column with a list
+    of matches for each row."""
+def find_all(texts, regex):
+    # findall returns the groups instead of the whole match when the
+        # regular expression has groups, as a regular expression from a
+        # terms file may.
+    if regex.groups:
+        return texts.map(lambda text: [match.group()
+                                       for match in regex.finditer(text)])
+    return texts.str.findall(regex)
+
+"""
+This function removes leading and trailing whitespace from each item in a
+    column, then removes a leading and a trailing non-letter character
+    from each, like strip_item in cim_core.py."""
+def strip_items(items):
+    items = items.str.strip()
+    items = items.where(items.str[:1].str.isalpha(), items.str[1:])
+    return items.where(items.str[-1:].str.isalpha(), items.str[:-1])
+
+"""
+This function checks a column of texts for all of the regular expressions
+    and returns a table with the six match columns for each row, with the
+    same counts and lists as check_matches in cim_core.py."""
+def match_column(texts):
+    results = pd.DataFrame(index = texts.index)
+    # Most rows of a typical export have no matches at all, so check each
+        # row once for any match first, and then check only the rows with
+        # matches for each regular expression separately.
+    texts = texts[has_matches(texts)]
+    for tier in tiers:
+        # Put each match in a row of its own, labeled with the row of the
+            # text it came from.
+        items = pd.concat([find_all(texts, regex).explode().dropna()
+                           for regex_tier, regex in tiered_res
+                           if regex_tier == tier] +
+                          [pd.Series(dtype = object)])
+        items = strip_items(items)
+        # Count the matches in each row.
+        counts = items.groupby(level = 0).size()
+        results["Number of " + tier + " Matches"] = counts.reindex(
+            results.index, fill_value = 0)
+        # List the distinct matches in each row in alphabetical order,
+            # ignoring capitalization.
+        distinct = pd.DataFrame({"Row": items.index, "Item": items.values})
+        distinct = distinct.drop_duplicates()
+        distinct["Key"] = distinct["Item"].str.casefold()
+        distinct = distinct.sort_values(["Row", "Key", "Item"])
+        # Adding up the items of each row with "; " after each one is much
+            # faster than joining them, which pandas does one row at a time.
+        lists = (distinct["Item"] + "; ").groupby(distinct["Row"]).sum()
+        lists = lists.str[:-2]
+        results[tier + " Matches"] = lists.reindex(results.index,
+                                                   fill_value = "")
+    return results[match_fields]
+
+def main():
+    # Name the output file.
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    output_csv = os.path.join(destination_path,
+                              f"cim-column-matches_{timestamp}.csv")
+
+    # Read every column as text, and leave empty cells empty rather than
+        # treating them as missing.
+    chunks = pd.read_csv(os.path.join(source_path, source_csv),
+                         encoding = "utf-8-sig", dtype = str,
+                         keep_default_na = False, chunksize = rows_per_chunk)
+    row_count = 0
+    with open(output_csv, "w", newline = "",
+              encoding = "utf-8-sig") as output_file:
+        for number, chunk in enumerate(chunks):
+            # Put the text columns of each row together, with a new line
+                # before and after them and a blank line between them.
+            texts = "\n" + chunk[text_columns[0]]
+            for column in text_columns[1:]:
+                texts = texts + "\n\n" + chunk[column]
+            texts = texts + "\n"
+            results = match_column(texts)
+            chunk = chunk.drop(columns = match_fields, errors = "ignore")
+            chunk = pd.concat([chunk, results], axis = 1)
+            chunk.to_csv(output_file, header = number == 0, index = False,
+                         lineterminator = "\r\n")
+            row_count += len(chunk)
+            print(f"Checked {row_count} rows.")
+
+    print(f"The results are in {output_csv}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,561 @@
+#! python3
+# cim-crawler.py
+
+"""
+This program looks through a whole website, such as a medical school's,
+    for references to AAMC's Careers in Medicine program (CiM), without
+    needing a list of URLs first. Starting from one page, it finds the
+    website's pages in its sitemaps (the lists of pages that many
+    websites publish for search engines) and in the links on each page
+    it visits, and checks each page for the same text strings as
+    cim-scraper.py. It outputs a CSV file with a row for each page, using
+    the same columns as cim-scraper.py, plus how many links away from the
+    start each page was found and where.
+
+The program only visits pages on the same website as the start page, and
+    only pages that the website's robots.txt file allows. It visits one
+    page at a time with a pause between them (see host_delay below), so
+    a large website can take a long time. To keep a run from going on
+    indefinitely, it stops after a set number of pages or bytes, and it
+    does not follow links more than a set number of pages away from the
+    start (see max_pages, max_total_bytes, and max_depth below).
+
+The program keeps memory use low even on websites with hundreds of
+    thousands of pages. It reads sitemaps a piece at a time rather than
+    all at once, remembers the pages it has already found as short codes
+    rather than whole URLs, and keeps only a limited number of pages
+    waiting to be visited (see max_frontier below).
+
+To try the program on a copy of a website saved on this computer, run
+    "python -m http.server 8000" in the copy's folder and set start_url to
+    "http://127.0.0.1:8000/".
+
+Instructions:
+(1) Edit this script to indicate the website to look through and where
+    you want the output CSV file to be saved. Users will need to edit
+    only two lines of code, both located between the long lines of
+    hashes. Specifically, they will need to edit the variables start_url
+    and destination_path to reflect the correct information. The other
+    variables between the long lines of hashes are optional settings that
+    can be left as they are. The start URL can also be given on the
+    command line after the program's name.
+
+(2) Run the program."""
+
+# Import libraries.
+import collections
+import csv
+import datetime
+import gzip
+import hashlib
+import html
+import io
+import os
+import re
+import sys
+import time
+import urllib.parse
+import urllib.robotparser
+import xml.etree.ElementTree
+
+import requests
+
+from cim_core import (added_fields, canonical_url, check_matches,
+                      content_kind, find_matches_in_bytes, get_title,
+                      get_title_from_bytes, page_encoding, record_matches,
+                      skip_reason)
+from cim_pdf import PdfError, find_matches_in_pdf
+
+########################################################################
+# Specify variables.
+
+# Specify the page to start from. Every page found on the same website is
+    # checked, so this is usually the website's home page.
+start_url = "https://www.aamc.org/"
+
+# Specify the destination path. This is the folder to which the output
+    # will be saved. Replace only what is between the quotation marks, not
+    # the "r" that precedes them.
+destination_path = r"C:\Users\rastley\Documents"
+
+# Optional: Specify whether to look for pages in the website's sitemaps
+    # (True). The sitemaps are found through the website's robots.txt
+    # file, or at /sitemap.xml if it does not list any.
+use_sitemaps = True
+
+# Optional: Specify whether to follow the links on each page to find more
+    # pages (True).
+follow_links = True
+
+# Optional: Specify whether pages on other parts of the same website, such
+    # as "medicine.example.edu" when starting from "www.example.edu",
+    # count as the same website (True). Either way, "www." at the
+    # beginning of a website's name is ignored.
+include_subdomains = False
+
+# Optional: Specify the most links to follow from the start page and the
+    # sitemaps to reach a page. Pages that are further away are not
+    # visited.
+max_depth = 3
+
+# Optional: Specify the most pages to visit, and the most bytes to
+    # download altogether. The program stops when it reaches either one.
+    # Set either to 0 for no limit.
+max_pages = 1000
+max_total_bytes = 500000000
+
+# Optional: Specify the most bytes of each page to download and check.
+    # Anything after that is not checked.
+max_page_bytes = 10000000
+
+# Optional: Specify the most pages to keep waiting to be visited. Pages
+    # that are found while this many are waiting are left out, which
+    # keeps memory use in check on very large websites.
+max_frontier = 100000
+
+# Optional: Specify the shortest pause, in seconds, between pages, to
+    # avoid the program being flagged as a bot. If the website's
+    # robots.txt file asks for a longer pause, that is used instead.
+host_delay = 5
+
+# Optional: Specify how many seconds to wait for a page to respond
+    # before giving up on it.
+request_timeout = 30
+
+# Optional: Specify the most pages of each PDF to check, and how many
+    # seconds to spend reading each PDF. Set either to 0 for no limit.
+pdf_page_limit = 200
+pdf_seconds = 60
+########################################################################
+
+# List the fields of the output CSV file.
+field_names = (["URL", "Depth", "Found On"] + added_fields +
+               ["Content Status"])
+
+# List the kinds of content that links are followed on, as they appear at
+    # the start of the Content-Type header. Which kinds are checked at all
+    # is decided by skip_reason in cim_core.py, like in cim-scraper.py.
+webpage_types = ["text/html", "application/xhtml+xml"]
+
+# List the endings of links to files that are not worth visiting, such as
+    # images and videos, so that they are not even requested.
+skipped_extensions = (".7z", ".avi", ".bmp", ".css", ".csv", ".doc", ".docx",
+                      ".eps", ".exe", ".gif", ".gz", ".ico", ".jpeg", ".jpg",
+                      ".js", ".m4a", ".mov", ".mp3", ".mp4", ".mpeg", ".png",
+                      ".ppt", ".pptx", ".svg", ".tif", ".tiff", ".wav",
+                      ".webm", ".webp", ".woff", ".woff2", ".xls", ".xlsx",
+                      ".zip")
+
+# Create a regular expression for links in a webpage, which finds the tag
+    # and the address it links to, with or without quotation marks. A
+    # "base" tag changes what the other links on the page are relative to.
+link_re = re.compile(
+    rb"""<(a|area|base)\s[^>]*?\bhref\s*=\s*"""
+    rb"""(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+
+# Create a session so that the connection to the website is reused rather
+    # than opened again for every page.
+session = requests.Session()
+
+"""
+This function returns the name of the website a URL is on, without "www."
+    at the beginning, in lowercase."""
+def site_name(url):
+    host = (urllib.parse.urlsplit(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    return host
+
+"""
+This function returns True if a URL is on the website being crawled,
+    whose name is site."""
+def on_site(url, site):
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        return False
+    host = site_name(url)
+    return host == site or include_subdomains and host.endswith("." + site)
+
+"""
+This function returns a short code for a URL, which is the same for URLs
+    that canonical_url in cim_core.py counts as the same page, as
+    cim-scraper.py does. The crawler adds two rules of its own, since it
+    stays on one website and follows the links on it, where the same page
+    is often linked to in different ways: "www." at the beginning of the
+    website name makes no difference, since site_name leaves it out too,
+    and a page named index.html or index.htm counts as the same page as
+    its folder, which is what web servers show for the folder. The
+    program keeps the codes of the pages it has found rather than the URLs
+    themselves, since eight bytes take much less memory than a URL of a
+    hundred characters or more."""
+def url_code(url):
+    parts = urllib.parse.urlsplit(canonical_url(url))
+    host = parts.netloc
+    if host.startswith("www."):
+        host = host[len("www."):]
+    # canonical_url has already removed any slash at the end.
+    folder, slash, name = parts.path.rpartition("/")
+    path = parts.path
+    if name.lower() in ("index.html", "index.htm"):
+        path = folder
+    key = host + path + "?" + parts.query
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"),
+                                          digest_size = 8).digest(), "big")
+
+"""
+This class keeps the pages waiting to be visited, in the order they were
+    found, and the codes of every page found so far. Each page is only
+    added once, and once max_frontier pages are waiting, new pages are
+    left out until there is room. It counts the pages left out."""
+class Frontier:
+    def __init__(self):
+        self.waiting = collections.deque()
+        self.found = set()
+        self.left_out = 0
+
+    def __len__(self):
+        return len(self.waiting)
+
+    # Add a page, returning True if it was added.
+    def add(self, url, depth, found_on):
+        code = url_code(url)
+        if code in self.found:
+            return False
+        if len(self.waiting) >= max_frontier:
+            self.left_out += 1
+            return False
+        self.found.add(code)
+        self.waiting.append((url, depth, found_on))
+        return True
+
+    # Note that a page has been found without adding it, for example
+        # because another URL redirected to it.
+    def mark_found(self, url):
+        self.found.add(url_code(url))
+
+    def next(self):
+        return self.waiting.popleft()
+
+"""
+This class requests pages from the website one at a time, with a pause of
+    at least delay seconds between requests, and counts the bytes
+    received."""
+class PoliteSession:
+    def __init__(self, delay):
+        self.delay = delay
+        self.last = 0
+        self.total_bytes = 0
+
+    def get(self, url):
+        wait = self.last + self.delay - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.last = time.monotonic()
+        return session.get(url, stream = True, timeout = request_timeout)
+
+    # Download the rest of a response, up to limit bytes if limit is not 0,
+        # and return the bytes and whether there was more. The bytes are
+        # counted as they arrive, so that they still count if the
+        # download fails partway through.
+    def read(self, response, limit = 0):
+        data = bytearray()
+        truncated = False
+        for chunk in response.iter_content(65536):
+            if limit and len(data) + len(chunk) > limit:
+                chunk = chunk[:limit - len(data)]
+                truncated = True
+            data += chunk
+            self.total_bytes += len(chunk)
+            if truncated:
+                break
+        return bytes(data), truncated
+
+"""
+This function reads the website's robots.txt file and returns a parser
+    for it, which says whether a page may be visited and lists the
+    website's sitemaps. If the file cannot be read, every page may be
+    visited."""
+def read_robots(url):
+    parser = urllib.robotparser.RobotFileParser()
+    robots_url = urllib.parse.urljoin(url, "/robots.txt")
+    try:
+        response = session.get(robots_url, timeout = request_timeout)
+        lines = response.text.splitlines() if response.ok else []
+    except requests.RequestException:
+        lines = []
+    parser.parse(lines)
+    return parser
+
+"""
+This function reads a sitemap and every sitemap listed in it, a piece at
+    a time, and yields the URL of each page they list. A sitemap can be
+    a list of pages or a list of other sitemaps (a sitemap index), and it
+    can be compressed with gzip. Sitemaps that cannot be read are
+    skipped."""
+def sitemap_pages(polite, sitemap_urls, site):
+    waiting = collections.deque(sitemap_urls)
+    read = set()
+    while waiting:
+        sitemap_url = waiting.popleft()
+        if sitemap_url in read or not on_site(sitemap_url, site):
+            continue
+        read.add(sitemap_url)
+        try:
+            response = polite.get(sitemap_url)
+            with response:
+                if not response.ok:
+                    print("Could not read the sitemap " + sitemap_url + " (" +
+                          str(response.status_code) + ")")
+                    continue
+                # Let requests undo any compression the website applied for
+                    # sending the file, and undo the compression of a
+                    # sitemap that is saved compressed, which starts with
+                    # the bytes 1F 8B. Keep the download open until it
+                    # has all been read, since reading it in larger pieces
+                    # can reach the end before the sitemap has been read.
+                response.raw.decode_content = True
+                response.raw.auto_close = False
+                source = io.BufferedReader(response.raw)
+                if source.peek(2).startswith(b"\x1f\x8b"):
+                    source = gzip.GzipFile(fileobj = source)
+                # Count the bytes downloaded toward max_total_bytes, like
+                    # the bytes of pages, as the sitemap is read and even if
+                    # it cannot be read to the end.
+                counted = polite.total_bytes
+                try:
+                    root = None
+                    for event, element in xml.etree.ElementTree.iterparse(
+                            source, events = ("start", "end")):
+                        if root is None:
+                            root = element
+                        if event != "end":
+                            continue
+                        # Ignore the namespace at the start of each tag.
+                        tag = element.tag.rsplit("}", 1)[-1]
+                        if tag not in ("url", "sitemap"):
+                            continue
+                        location = None
+                        for child in element:
+                            if child.tag.rsplit("}", 1)[-1] == "loc":
+                                location = (child.text or "").strip()
+                        if location and tag == "sitemap":
+                            waiting.append(location)
+                        elif location:
+                            polite.total_bytes = (counted +
+                                                  response.raw.tell())
+                            yield location
+                        # Forget the parts of the sitemap already read.
+                        root.clear()
+                finally:
+                    polite.total_bytes = counted + response.raw.tell()
+        except (requests.RequestException, xml.etree.ElementTree.ParseError,
+                OSError, EOFError) as error:
+            print("Could not read the sitemap " + sitemap_url + " (" +
+                  type(error).__name__ + ")")
+
+"""
+This function returns the encoding a website gave for a page if Python can
+    decode text with it, or None if the website gave none or gave one that
+    Python does not know, such as a misspelled name."""
+def known_encoding(encoding):
+    if encoding is None:
+        return None
+    # Decoding a byte also rules out names such as "base64" that are not
+        # text encodings.
+    try:
+        b" ".decode(encoding, errors = "replace")
+    except LookupError:
+        return None
+    return encoding
+
+"""
+This function finds the links on a webpage and returns the URLs they lead
+    to, without any part starting with "#". url is the URL of the page,
+    which the links can be relative to."""
+def find_links(data, url, encoding):
+    base = url
+    links = []
+    for match in link_re.finditer(data):
+        address = match.group(2) or match.group(3) or match.group(4) or b""
+        address = html.unescape(address.decode(encoding,
+                                               errors = "replace")).strip()
+        if match.group(1).lower() == b"base":
+            base = urllib.parse.urljoin(url, address)
+            continue
+        if not address or address.startswith("#"):
+            continue
+        link = urllib.parse.urldefrag(urllib.parse.urljoin(base, address))[0]
+        links.append(link)
+    return links
+
+"""
+This function reads the rest of a response and checks it, adding the
+    results to row, the dictionary for the page. It returns a list of
+    the links on the page, if it is a webpage."""
+def check_response(polite, response, row):
+    links = []
+    kind = content_kind(response.headers)
+    # Pages over max_page_bytes are cut short rather than skipped.
+    reason = skip_reason(response.headers)
+    if not response.ok:
+        row["Content Status"] = "Skipped: the page did not load"
+    elif reason is not None:
+        row["Content Status"] = reason
+    elif kind == "application/pdf":
+        data, truncated = polite.read(response, max_page_bytes)
+        if truncated:
+            row["Content Status"] = "Skipped: PDF too large"
+            return links
+        try:
+            title, matches, note, finished = find_matches_in_pdf(
+                data, pdf_page_limit, pdf_seconds)
+            row["Scraped Title"] = title
+            row["Content Status"] = "Checked (" + note + ")"
+            record_matches(matches, row)
+        except PdfError as error:
+            row["Content Status"] = ("Could not check PDF (" +
+                                     str(error) + ")")
+    else:
+        data, truncated = polite.read(response, max_page_bytes)
+        declared = known_encoding(response.encoding)
+        encoding = page_encoding(declared, data)
+        # Check the bytes of the page directly if its encoding allows
+            # it, and otherwise decode it first.
+        if encoding is not None:
+            row["Scraped Title"] = get_title_from_bytes(data, encoding)
+            record_matches(find_matches_in_bytes(data, encoding), row)
+        else:
+            # A page that does not say how it is encoded, or names an
+                # encoding Python does not know, and is not UTF-8 is
+                # most likely Windows-1252, which is what web browsers
+                # assume.
+            text = data.decode(declared or "cp1252", errors = "replace")
+            row["Scraped Title"] = get_title(text)
+            check_matches(text, row)
+            # Links are found in bytes, so encode the text the way
+                # they are found.
+            data = text.encode("utf-8")
+            encoding = "utf-8"
+        row["Content Status"] = "Checked"
+        if truncated:
+            row["Content Status"] += (" (first " + str(max_page_bytes) +
+                                      " bytes)")
+        if follow_links and (kind in webpage_types or not kind):
+            links = find_links(data, response.url, encoding)
+    return links
+
+"""
+This function downloads a page and checks it, returning a dictionary with
+    the same fields as a row of the output of cim-scraper.py and a list
+    of the links on the page, if it is a webpage."""
+def check_page(polite, url):
+    row = {"URL": url, "Scraped Title": "N/A"}
+    links = []
+    try:
+        response = polite.get(url)
+    except requests.RequestException as error:
+        row["Scrape Response"] = type(error).__name__ + ": " + str(error)
+        return row, links
+    with response:
+        row["Scrape Response"] = response
+        try:
+            links = check_response(polite, response, row)
+        # The connection can also fail partway through the page, which
+            # should not stop the crawl.
+        except requests.RequestException as error:
+            row["Scrape Response"] = (type(error).__name__ + ": " +
+                                      str(error))
+            row["Content Status"] = "Could not download the page"
+    return row, links
+
+"""
+This function returns True if a URL should be visited: it is on the
+    website, robots.txt allows it, and it does not end in one of
+    skipped_extensions."""
+def worth_visiting(url, site, robots):
+    if not on_site(url, site):
+        return False
+    if urllib.parse.urlsplit(url).path.lower().endswith(skipped_extensions):
+        return False
+    return robots.can_fetch(session.headers.get("User-Agent", "*"), url)
+
+"""
+This function runs the program."""
+def main():
+    # Take the start URL from the command line, if it is given there.
+    start = sys.argv[1] if len(sys.argv) > 1 else start_url
+    site = site_name(start)
+    robots = read_robots(start)
+    # Pause at least as long as the website's robots.txt file asks.
+    delay = host_delay
+    agent = session.headers.get("User-Agent", "*")
+    if robots.crawl_delay(agent):
+        delay = max(delay, float(robots.crawl_delay(agent)))
+    polite = PoliteSession(delay)
+    frontier = Frontier()
+    frontier.add(start, 0, "Start")
+
+    # Add the pages listed in the website's sitemaps, stopping once the
+        # frontier is full.
+    if use_sitemaps:
+        sitemap_urls = robots.site_maps() or [
+            urllib.parse.urljoin(start, "/sitemap.xml")]
+        listed = 0
+        for url in sitemap_pages(polite, sitemap_urls, site):
+            if max_total_bytes and polite.total_bytes >= max_total_bytes:
+                print("Stopped reading the sitemaps after max_total_bytes "
+                      "bytes.")
+                break
+            if len(frontier) >= max_frontier:
+                print("The sitemaps list more pages than max_frontier, so "
+                      "the rest of them were not read.")
+                break
+            if worth_visiting(url, site, robots):
+                listed += frontier.add(url, 0, "Sitemap")
+        print("Found " + str(listed) + " new pages in the sitemaps.")
+
+    # Name the output file.
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    output_csv = os.path.join(destination_path,
+                              "cim-crawl_" + site + "_" + timestamp + ".csv")
+
+    # Visit the waiting pages in the order they were found, writing each
+        # row as soon as the page has been checked.
+    visited = 0
+    with open(output_csv, "w", newline = "",
+              encoding = "utf-8-sig") as output_file:
+        writer = csv.DictWriter(output_file, fieldnames = field_names)
+        writer.writeheader()
+        while len(frontier) > 0:
+            if max_pages and visited >= max_pages:
+                print("Stopped after max_pages pages.")
+                break
+            if max_total_bytes and polite.total_bytes >= max_total_bytes:
+                print("Stopped after max_total_bytes bytes.")
+                break
+            url, depth, found_on = frontier.next()
+            row, links = check_page(polite, url)
+            visited += 1
+            row["Depth"] = depth
+            row["Found On"] = found_on
+            writer.writerow(row)
+            output_file.flush()
+            # A page that redirected elsewhere on the website does not
+                # need to be visited again under its new URL.
+            final_url = getattr(row["Scrape Response"], "url", url)
+            frontier.mark_found(final_url)
+            if depth < max_depth:
+                for link in links:
+                    if worth_visiting(link, site, robots):
+                        frontier.add(link, depth + 1, final_url)
+            print(str(visited) + " pages checked, " + str(len(frontier)) +
+                  " waiting")
+
+    print("Checked " + str(visited) + " pages and downloaded " +
+          str(polite.total_bytes) + " bytes.")
+    if frontier.left_out:
+        print(str(frontier.left_out) + " pages were left out because " +
+              str(max_frontier) + " pages were already waiting.")
+    print("The results are in " + output_csv + ".")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#! python3
+# cim-files.py
+
+"""
+This program checks saved documents, such as webpages saved as HTML files
+    or text copied into TXT files, for references to AAMC's Careers in
+    Medicine program (CiM). It looks through a folder and every folder
+    inside it, checks each file for the same text strings as
+    cim-scraper.py and cim-clipboard.py, and determines which of them are
+    more likely to refer to CiM, which may or may not refer to CiM, and
+    which probably do not refer to CiM. It outputs a CSV file with one row
+    for each file, using the same columns as cim-scraper.py.
+
+PDF files are checked too if the third-party module pypdf is installed.
+    Each PDF is read a page at a time in a process of its own, which is
+    stopped if the PDF takes too long (see pdf_seconds below), and the
+    row says how many pages were checked under "Scrape Response".
+
+The program checks several files at the same time, each in a separate
+    process, so that it can use every processor core on the computer. If
+    a file cannot be read, its row says why under "Scrape Response", and
+    the program goes on to the next file.
+
+Instructions:
+(1) Save the documents you want to check in one folder. They can be in
+    folders inside that folder.
+
+(2) Edit this script to indicate where the documents are saved and where
+    you want the output CSV file to be saved. Users will need to edit only
+    two lines of code, both located between the long lines of hashes.
+    Specifically, they will need to edit the variables source_path and
+    destination_path to reflect the correct information. The other
+    variables between the long lines of hashes are optional settings that
+    can be left as they are."""
+
+# Import libraries.
+import concurrent.futures
+import csv
+import datetime
+import multiprocessing
+import os
+
+from cim_core import added_fields, check_matches, get_title, record_matches
+from cim_pdf import find_matches_in_pdf
+
+########################################################################
+# Specify variables.
+# I recommend using folders on a hard drive. While this program should
+    # work on a network drive, it may take longer.
+
+# Specify the source path. This is the folder where the documents are
+    # saved. Replace only what is between the quotation marks, not the
+    # "r" that precedes them.
+source_path = r"C:\Users\rastley\Documents\Search Results"
+
+# Specify the destination path. This is the folder to which the output
+    # will be saved. Replace only what is between the quotation marks, not
+    # the "r" that precedes them.
+destination_path = r"C:\Users\rastley\Documents"
+
+# Optional: Specify which kinds of files to check, by their extensions.
+    # Files with other extensions are skipped.
+extensions = [".html", ".htm", ".txt", ".pdf"]
+
+# Optional: Specify how many separate processes to use for checking the
+    # files. Set this to 0 to use one for each processor core.
+workers = 0
+
+# Optional: Specify how many files to hand to a process at a time. Larger
+    # numbers are faster when there are many small files.
+files_per_batch = 16
+
+# Optional: Specify the most pages of each PDF to check. Set this to 0 to
+    # check every page.
+pdf_page_limit = 200
+
+# Optional: Specify how many seconds to spend reading each PDF. No more
+    # pages are read after this, and if reading one page keeps going for
+    # much longer, the PDF is given up on. Set this to 0 for no limit.
+pdf_seconds = 60
+########################################################################
+
+"""
+This function looks through the source folder and every folder inside it
+    and returns a sorted list of the paths of the files to check."""
+def find_files():
+    paths = []
+    allowed = tuple(extension.lower() for extension in extensions)
+    for folder, subfolders, filenames in os.walk(source_path):
+        # Look through the folders in alphabetical order.
+        subfolders.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(allowed):
+                paths.append(os.path.join(folder, filename))
+    return paths
+
+"""
+This function reads a file, identifies its title, and checks its text for
+    matches. It returns a dictionary for the file's row in the output. If
+    the file cannot be read or checked, the row says why instead."""
+def scan_file(path):
+    # Start the row with the file's path relative to the source folder.
+    row = {"File": os.path.relpath(path, source_path)}
+    try:
+        if path.lower().endswith(".pdf"):
+            title, matches, note, finished = find_matches_in_pdf(
+                path, pdf_page_limit, pdf_seconds)
+            row["Scraped Title"] = title
+            row["Scrape Response"] = "OK (" + note + ")"
+            record_matches(matches, row)
+            return row
+        # Replace any bytes that are not valid UTF-8 rather than giving
+            # up on the whole file.
+        with open(path, encoding = "utf-8", errors = "replace") as file:
+            text = file.read()
+        row["Scraped Title"] = get_title(text)
+        row["Scrape Response"] = "OK"
+        check_matches(text, row)
+    except Exception as error:
+        row["Scraped Title"] = "N/A"
+        row["Scrape Response"] = f"{type(error).__name__}: {error}"
+    return row
+
+def main():
+    paths = find_files()
+    print(f"Found {len(paths)} files to check.")
+
+    # Name the output file.
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    output_csv = os.path.join(destination_path,
+                              f"cim-file-matches_{timestamp}.csv")
+
+    # Check the files in separate processes and write each row as soon as
+        # it is ready, keeping the rows in the same order as the files.
+        # The processes start from scratch, the way they do on Windows.
+    with open(output_csv, "w", newline = "",
+              encoding = "utf-8-sig") as output_file, \
+         concurrent.futures.ProcessPoolExecutor(
+             max_workers = workers or None,
+             mp_context = multiprocessing.get_context("spawn")) as pool:
+        writer = csv.DictWriter(output_file,
+                                fieldnames = ["File"] + added_fields)
+        writer.writeheader()
+        errors = 0
+        for number, row in enumerate(pool.map(scan_file, paths,
+                                              chunksize = files_per_batch),
+                                     start = 1):
+            writer.writerow(row)
+            if not row["Scrape Response"].startswith("OK"):
+                errors += 1
+            if number % 500 == 0:
+                print(f"Checked {number} of {len(paths)} files.")
+
+    print(f"Checked {len(paths)} files ({errors} could not be read).")
+    print(f"The results are in {output_csv}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#! python3
+# cim-results.py
+
+"""
+This program looks up the results that cim-scraper.py saved in its
+    database when use_database is True. Run it from the command line with
+    one of the following after its name:
+
+    runs
+        List every run, with how many rows it has written.
+    likely [RUN]
+        List the URLs with more likely matches in a run, with the most
+        matches first. Without a run ID, it uses the most recent run.
+    history URL
+        Show the number of matches of each type on a URL in every run
+        that checked it, to see how they changed.
+    export RUN FILENAME
+        Save the results of a run to a CSV file with the same columns as
+        the output CSV file of cim-scraper.py.
+
+Instructions:
+(1) Edit this script to indicate where the database is saved. Users will
+    need to edit only one line of code, located between the long lines
+    of hashes. Specifically, they will need to edit the variable
+    database_path to match database_path in cim-scraper.py.
+
+(2) Run the program from the command line as described above."""
+
+# Import libraries.
+import sys
+
+from cim_store import (export_run, last_run, list_runs, more_likely_pages,
+                       open_database, url_history)
+
+########################################################################
+# Specify variables.
+
+# Specify the database file. Replace only what is between the quotation
+    # marks, not the "r" that precedes them.
+database_path = r"C:\Users\rastley\Documents\cim-results.db"
+########################################################################
+
+"""
+This function runs the program."""
+def main():
+    arguments = sys.argv[1:]
+    command = arguments[0] if arguments else ""
+    connection = open_database(database_path)
+
+    if command == "runs" and len(arguments) == 1:
+        for run_id, started, finished, source, output, count in list_runs(
+                connection):
+            print(str(run_id) + ": " + source + " -> " + output)
+            print("    started " + started + ", " +
+                  ("finished " + finished if finished else "not finished") +
+                  ", " + str(count) + " rows")
+    elif command == "likely" and len(arguments) <= 2:
+        run_id = int(arguments[1]) if len(arguments) == 2 else last_run(
+            connection)
+        pages = more_likely_pages(connection, run_id)
+        print(str(len(pages)) + " URLs with more likely matches in run " +
+              str(run_id) + ":")
+        for url, title, count, matches in pages:
+            print(str(count).rjust(5) + "  " + url)
+            print("       " + str(title) + " (" + str(matches) + ")")
+    elif command == "history" and len(arguments) == 2:
+        print("Run  Checked              More Likely  Possible  Unlikely  "
+              "Response")
+        for run_id, checked, response, more_likely, possible, unlikely in (
+                url_history(connection, arguments[1])):
+            print(str(run_id).ljust(5) + checked.ljust(21) +
+                  str(more_likely).rjust(11) + str(possible).rjust(10) +
+                  str(unlikely).rjust(10) + "  " + str(response))
+    elif command == "export" and len(arguments) == 3:
+        count = export_run(connection, int(arguments[1]), arguments[2])
+        print("Saved " + str(count) + " rows to " + arguments[2] + ".")
+    else:
+        print(__doc__.split("Instructions:")[0].strip())
+
+    connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,61 @@ Note that if the output lists 0 matches for a page, it does not
 
 Depending on how many URLs you want to check, this program can take a
     while to run--at least 5 seconds per URL, due to a built-in pause
-    to avoid the program being flagged as a bot.
+    to avoid the program being flagged as a bot. If the URLs are spread
+    across many different websites, you can instead have the program
+    check several URLs at the same time (see check_concurrently below),
+    which is much faster. Or you can have it check URLs from different
+    websites at the same time while still pausing between URLs from the
+    same website (see schedule_by_website below), which is nearly as
+    fast and more considerate of each website.
+
+The program saves a copy of each page it downloads in a cache folder
+    (see use_cache below). If you run the program again on the same
+    URLs--for example, after changing the regular expressions--it uses
+    the saved copies instead of downloading the pages again, checking
+    with each website only whether the page has changed since.
+
+To find out where the time goes during a run--downloading the pages or
+    checking them--set record_timings (below) to True. Each row then
+    says how long each step took for that page, and at the end the
+    program shows a summary of the whole run.
+
+If the same page appears more than once in the CSV file--for example,
+    once with "http" and once with "https", with and without a slash at
+    the end, or with different tracking codes such as "utm_source" after
+    a question mark--the program checks it only once and copies the
+    results to the other rows (see deduplicate_urls below). Likewise, if
+    different URLs have exactly the same content--for example, a press
+    release posted on several websites--the program checks the content
+    only once (see content_memory_size below).
+
+Before downloading a page, the program looks at what kind of file the
+    website says it is and how large. It skips files that are not
+    webpages or text, such as images and videos, and files that are too
+    large, and says why under "Content Status" (see check_content_types
+    below). PDFs are checked too if the third-party module pypdf is
+    installed (see check_pdfs below).
+
+The program can also save its results in a database (see use_database
+    below), which keeps the results of every run in one place. The
+    program cim-results.py looks up results in the database--for
+    example, every page with more likely matches in the most recent run,
+    or how the matches on a page changed from run to run--and can save
+    the results of any run as a CSV file like the ones this program
+    outputs.
+
+The program can check several CSV files in one run--for example, a
+    folder of search results from different databases (see source_csv
+    below). It writes a separate output CSV file for each of them, with
+    the name of the source CSV file in its name, and a page that already
+    appeared in an earlier file is not checked again. If one file cannot
+    be finished, the program says why and goes on to the next one.
+
+The program writes each row of the output CSV file as soon as it has
+    checked the page, and keeps track of the finished rows in a journal
+    file next to it. If a run is interrupted, run the program again with
+    resume (below) set to True, or from the command line with
+    "--resume", to continue where it left off instead of starting over.
 
 Instructions:
 (1) Prepare the CSV file:
@@ -41,28 +95,59 @@ Instructions:
             Possible Matches
             Number of Unlikely Matches
             Unlikely Matches
+            Truncated
+            Connect Seconds
+            First Byte Seconds
+            Download Seconds
+            Bytes Received
+            Parse Seconds
+            Match Seconds
+            Error
+            Same Page As Row
+            Content Hash
+            Content Status
         
     (d) Save as a CSV file with UTF-8 encoding.
     
 (2) Edit this script to indicate where the name of the CSV file, where
     it is saved, and where you want the output CSV file to be saved.
     Users will need to edit only three lines of code, all located
-    between the long lines of hashes (lines 67-86). Specifically, they
-    will need to edit the variables in lines 75, 79, and 85 to reflect
-    the correct information."""
+    between the long lines of hashes. Specifically, they will need to
+    edit the variables source_path, source_csv, and destination_path to
+    reflect the correct information. The other variables between the
+    long lines of hashes are optional settings that can be left as
+    they are."""
 
 # Import libraries.
-from bs4 import BeautifulSoup
+import array
+import codecs
+import collections
+import concurrent.futures
+import contextlib
 import csv
 import datetime
+import email.utils
 import glob
+import hashlib
+import heapq
+import json
+import multiprocessing
 import os
-import pandas as pd
 from pathlib import Path
-import re
 import requests
-import shutil
+import sys
+import threading
 import time
+import urllib.parse
+import urllib.robotparser
+import urllib3
+
+from cim_core import (MatchScanner, TitleParser, added_fields,
+                      canonical_url, check_matches, combined_re, content_kind,
+                      find_matches_in_bytes, get_title, get_title_from_bytes,
+                      page_encoding, record_matches, skip_reason, website)
+from cim_pdf import PdfError, find_matches_in_pdf
+from cim_store import ResultStore
 
 ########################################################################
 # Specify variables.
@@ -75,7 +160,11 @@ import time
 source_path = r"C:\Users\rastley\Documents"
 
 # Specify the name of the CSV file that has the URLs. Include the .csv
-    # extension.
+    # extension. To check several CSV files in one run, use * to stand for
+    # any part of the name--for example, "*.csv" for every CSV file in the
+    # source path. The name can also be given on the command line after
+    # the program's name, such as "Search Results *.csv" in quotation
+    # marks.
 source_csv = "Predictors of Relationship Persistence.csv"
 
 # Specify the destination path. This is the folder to which the output
@@ -83,178 +172,1456 @@ source_csv = "Predictors of Relationship Persistence.csv"
     # path. Replace only what is between the quotation marks, not the
     # "r" that precedes them.
 destination_path = r"C:\Users\rastley\Documents"
-########################################################################
 
-"""
-This function goes through all items on a list, and leading and trailing
-    whitespace, removes leading and trailing non-letter characters, and
-    adds the stripped item to a new list."""
-def strip_list(old_list, new_list):
-    for i in old_list:
-        # Remove leading and trailing whitespace.
-        i_1 = i.strip()
-        # If the first character is not a letter, remove it.
-        if i_1[0].isalpha() == False:
-            i_2 = i_1[1:]
-        else:
-            i_2 = i_1
-        # If the last character is not a letter, remove it.
-        if i_2[-1].isalpha() == False:
-            i_3 = i_2[:-1]
-        else:
-            i_3 = i_2
-        # Add the stripped item to the new list.
-        new_list.append(i_3)
-
-# Create regular expressions to identify more likely, possible, and
-    # unlikely true positives. Some groups are split into multiple
-    # regular expressions (a) to make it easier to deal with some
-    # matches requiring case sensitivity and others not, (b) to conform
-    # to PEP 8 guidelines regarding line length, and (c) to make the
-    # code easier to read.
-more_likely_re_1 = re.compile(r"Careers in Medicine|\WCiM\W")
-more_likely_re_2 = re.compile(r"medcar{1,2}e{1,2}rs", re.IGNORECASE)
-possible_re = re.compile(
-    r"Careers In Medicine|\Wcim\W|\WCIM\W|CAREERS IN MEDICINE")
-unlikely_re_1 = re.compile(r"[cC]areers in medicine")
-unlikely_re_2 = re.compile(r"career in", re.IGNORECASE)
-
-"""
-This function reads a string to find text that could indicate why that
-    page came up in the search results, notes whether that text is a
-    probable true positive, possible true positive, or probable false
-    positive with regard to referencing the AAMC program now called
-    Careers in Medicine. It counts the matches and lists them in a
-    dictionary."""
-def check_matches(text, dictionary):
-    # Check the text for each of the regular expressions.
-    more_likelies_1 = more_likely_re_1.findall(text)
-    more_likelies_2 = more_likely_re_2.findall(text)
-    possibles = possible_re.findall(text)
-    unlikelies_1 = unlikely_re_1.findall(text)
-    unlikelies_2 = unlikely_re_2.findall(text)
-
-    # Merge the regular expression match lists where there were multiple
-        # regular expressions for the same type of match.
-    more_likelies = more_likelies_1 + more_likelies_2
-    unlikelies = unlikelies_1 + unlikelies_2
-
-    # Create lists to which to add stripped matches.
-    stripped_more_likelies = []
-    stripped_possibles = []
-    stripped_unlikelies = []
-
-    # Strip each list.
-    strip_list(more_likelies, stripped_more_likelies)
-    strip_list(possibles, stripped_possibles)
-    strip_list(unlikelies, stripped_unlikelies)
-
-    # Remove duplicates from each list.
-    more_likelies_set_list = sorted(set(stripped_more_likelies),
-                                    key = str.casefold)
-    possibles_set_list = sorted(set(stripped_possibles), key = str.casefold)
-    unlikelies_set_list = sorted(set(stripped_unlikelies), key = str.casefold)
-
-    # Add the lists to the dictionary.
-    dictionary["Number of More Likely Matches"] = len(stripped_more_likelies)
-    dictionary["More Likely Matches"] = "; ".join(more_likelies_set_list)
-    dictionary["Number of Possible Matches"] = len(stripped_possibles)
-    dictionary["Possible Matches"] = "; ".join(possibles_set_list)
-    dictionary["Number of Unlikely Matches"] = len(stripped_unlikelies)
-    dictionary["Unlikely Matches"] = "; ".join(unlikelies_set_list)
-
-# Create sample text with which to test the regular expressions.
-sample_text = ("AAMC has a program called called Careers in " +
-               "Medicine, which is abbreviated \"CiM.\" \"CiM\"" + 
-               "sometimes appears between parentheses (CiM). " +
-               "Sometimes the name is rendered with a capitalized " +
-               "\"I,\" as in \"Careers In Medicine\" (CIM [CIM]). " +
-               "Some texts may use all capitals, shouting, " +
-               "\"CAREERS IN MEDICINE\"! The program used to be " +
-               "called MEDcareers or MedCAREERS or medCAREERS or " +
-               "medCareers or MEDCAREERS, or maybe even medcareers. " +
-               "One of those iterations was official, but people " +
-               "don't always write it that way (similar to how " +
-               "people write \"American Association of Medical " +
-               "Colleges\" instead of \"Association of American " +
-               "Medical Colleges\"). I think I've even seen " +
-               "something like \"Medcarrers\" in a non-English " +
-               "language text. Also, some search engines try to be " +
-               "helpful by including near matches, such as \"career " +
-               "in medicine,\" or even \"career in academic " +
-               "medicine.\" To be fair, this kind of thing is " +
-               "generally helpful--it just so happens that this is " +
-               "one of the cases where the near match is almost " +
-               "certainly a false positive. Similarly, search engines" +
-               "tend to be case insensitive, which is usually " +
-               "helpful--with CiM, however, it leads to many false " +
-               "positives, as many people talk about careers in " +
-               "medicine without referring to the AAMC program.")
+# Optional: Specify whether to check several URLs at the same time
+    # (True) or one at a time with a pause after each one (False).
+    # Checking several at the same time is much faster, but it does not
+    # pause between URLs, so it is best used when the URLs are spread
+    # across many different websites.
+check_concurrently = False
+
+# Optional: Specify whether to check URLs from different websites at the
+    # same time while pausing between URLs from the same website (True).
+    # The URLs are grouped by website and taken from each website in
+    # turn, so a run takes about as long as the pauses for the website
+    # with the most URLs, rather than as long as the pauses for every URL
+    # added together. The pause for a website is host_delay (below), or
+    # longer if the website's robots.txt file asks for a longer one. If a
+    # website says it is busy or fails to respond, the URL is tried again
+    # later (see max_retries below). Rows are written to the output CSV
+    # file in the order the pages are finished rather than the order of
+    # the source CSV file. When this is True, check_concurrently is
+    # ignored.
+schedule_by_website = False
+
+# Optional: Specify the shortest pause, in seconds, between URLs from the
+    # same website when schedule_by_website is True.
+host_delay = 5
+
+# Optional: Specify the most rows of the source CSV file to keep waiting
+    # in memory when schedule_by_website is True. The program reads more
+    # rows as pages are finished. If the source CSV file lists many URLs
+    # from the same website in a row, a larger number lets the program
+    # reach the URLs from other websites after them sooner, so that it can
+    # check more websites at the same time.
+max_waiting_rows = 10000
+
+# Optional: Specify how many times to try a URL again when
+    # schedule_by_website is True and the website says it is busy (for
+    # example, with a 429 or 503 status code) or does not respond. The
+    # program waits backoff_seconds before the first new try, and twice
+    # as long before each one after that, or longer if the website asks
+    # for a longer wait. It does not wait longer than longest_wait
+    # seconds; if a website asks for a longer wait, the URL is not tried
+    # again.
+max_retries = 3
+backoff_seconds = 10
+longest_wait = 600
+
+# Optional: Specify the most URLs to check at the same time when
+    # check_concurrently or schedule_by_website is True.
+max_concurrent_requests = 10
+
+# Optional: Specify how many separate processes to use for reading the
+    # pages and checking them for matches when check_concurrently or
+    # schedule_by_website is True. These processes work while other pages
+    # are still being downloaded, and each one can use a different
+    # processor core, which helps most with large pages. Set this to 0 to
+    # do that work in the same process as the downloads.
+parse_workers = 0
+
+# Optional: Specify how many seconds to wait for a page to respond
+    # before giving up on it.
+request_timeout = 30
+
+# Optional: Specify whether to save copies of downloaded pages in a cache
+    # folder (True) and reuse them on later runs, or to download every
+    # page from scratch every time (False).
+use_cache = True
+
+# Optional: Specify the cache folder. Replace only what is between the
+    # quotation marks, not the "r" that precedes them.
+cache_path = r"C:\Users\rastley\Documents\cim-cache"
+
+# Optional: Specify how many hours a saved copy of a page can be reused
+    # without checking with the website whether the page has changed.
+    # Set this to 0 to always check.
+cache_hours = 24
+
+# Optional: Specify whether to continue the most recent interrupted run on
+    # the same CSV file (True) instead of starting a new one (False).
+    # Running the program with "--resume" on the command line does the
+    # same thing.
+resume = False
+
+# Optional: Specify whether to download and check each page a chunk at a
+    # time as it arrives (True) instead of downloading the whole page
+    # before checking it (False). This keeps memory use low for very
+    # large pages. Pages downloaded this way are not saved in the cache,
+    # and they are checked in the download threads rather than by the
+    # parse workers.
+stream_pages = False
+
+# Optional: Specify how many bytes to download at a time when
+    # stream_pages is True.
+chunk_size = 65536
+
+# Optional: Specify the most bytes to download from any one page when
+    # stream_pages is True. If a page is larger, only the beginning of it
+    # is checked, and its row says "Yes" under "Truncated". Set this to 0
+    # to download every page in full.
+max_page_bytes = 10000000
+
+# Optional: Specify whether to add columns to the output CSV file that say
+    # how long each step of checking each page took and how many bytes
+    # were downloaded (True), and to show a summary of the whole run at the
+    # end. The steps are connecting to the website, waiting for the first
+    # byte of the response (which includes connecting), downloading the
+    # rest of the page, reading the page and finding its title ("Parse
+    # Seconds"), and checking the page for matches ("Match Seconds").
+    # Pages that could not be checked say why under "Error".
+record_timings = False
+
+# Optional: Specify whether to check each page only once when the same page
+    # appears in more than one row (True). Two URLs count as the same page
+    # if they differ only in "http" versus "https", capital letters in the
+    # website name, a slash at the end, a part starting with "#", the
+    # order of the parts after a question mark, or tracking codes (see
+    # tracking_parameters in cim_core.py). Each repeated row gets the
+    # results of the first row with the same page, and the column "Same
+    # Page As Row" gives the number of that row in the source CSV file,
+    # counting the row of field names as row 1. When several CSV files are
+    # checked in one run, a row can also repeat a page from an earlier
+    # file, and then the column gives the row and the name of that file.
+deduplicate_urls = True
+
+# Optional: Specify whether to skip files that are not webpages or text
+    # (True), such as images and videos, without downloading more
+    # than the beginning of the response. The program can tell what kind
+    # of file each URL is from the response before it downloads the rest.
+    # Each row says under "Content Status" whether the page was checked or
+    # why it was skipped. Set this to False to check every file.
+check_content_types = True
+
+# Optional: Specify the largest file, in bytes, to download when
+    # check_content_types is True. A file that the website says is larger
+    # is skipped. Set this to 0 to download files of any size.
+largest_file_bytes = 50000000
+
+# Optional: Specify whether to check PDFs (True) when check_content_types
+    # is True. This needs the third-party module pypdf. Without it, or if
+    # this is False, PDFs are skipped. Each PDF is read in a separate
+    # process, so that a PDF that takes too long can be stopped.
+check_pdfs = True
+
+# Optional: Specify the most pages of each PDF to check. Set this to 0 to
+    # check every page.
+pdf_page_limit = 200
+
+# Optional: Specify how many seconds to spend reading each PDF. No more
+    # pages are read after this, and if reading one page keeps going for
+    # much longer, the PDF is given up on. Set this to 0 for no limit.
+pdf_seconds = 60
+
+# Optional: Specify the most PDFs to read at the same time.
+pdf_workers = 2
+
+# Optional: Specify how many pages to remember the results for by their
+    # content, so that a page with exactly the same text as a page checked
+    # earlier--such as a press release posted on several websites, or a
+    # copy of a page on another website--is not checked again. Each row
+    # gives a code under "Content Hash" that is the same for every page
+    # with the same text, so that copies are easy to spot. Set this to 0
+    # to check every page.
+content_memory_size = 10000
+
+# Optional: Specify whether to save the remembered results in the cache
+    # folder at the end of each run (True), so that later runs can use
+    # them too. They are not used if the terms being looked for have
+    # changed since.
+save_content_memory = True
+
+# Optional: Specify whether to also save the results in a database (True),
+    # so that they can be looked up later with cim-results.py. Each run
+    # adds its results to the same database, and a resumed run continues
+    # the run it resumes.
+use_database = False
+
+# Optional: Specify the database file. Replace only what is between the
+    # quotation marks, not the "r" that precedes them.
+database_path = r"C:\Users\rastley\Documents\cim-results.db"
+
+# Optional: Specify how many rows to save in the database at a time.
+    # Saving many rows at once is much faster than saving each row by
+    # itself. Rows are also saved at least every few seconds.
+database_batch_size = 500
+########################################################################
 
 # Change the working directory to the source path.
 os.chdir(source_path)
 
-# Read the search results CSV file as a list of dictionaries.
-with open(source_csv, encoding = "utf-8-sig") as file:
-    pages = [{k: v for k, v in row.items()}
-             for row in csv.DictReader(file, skipinitialspace = True)]
+# Add a field for whether each page was truncated when pages are
+    # streamed.
+if stream_pages:
+    added_fields = added_fields + ["Truncated"]
+
+# List the fields added when record_timings is True.
+timing_fields = ["Connect Seconds",
+                 "First Byte Seconds",
+                 "Download Seconds",
+                 "Bytes Received",
+                 "Parse Seconds",
+                 "Match Seconds"]
+if record_timings:
+    added_fields = added_fields + timing_fields + ["Error"]
+if check_content_types:
+    added_fields = added_fields + ["Content Status"]
+if content_memory_size:
+    added_fields = added_fields + ["Content Hash"]
+if deduplicate_urls:
+    added_fields = added_fields + ["Same Page As Row"]
 
-# Create a variable to keep track of how many pages the program has
-    # checked.
-n = 1
+# List the fields that are copied from a page to the rows that repeat it.
+    # The timings are left blank, since the repeated rows took no time.
+copied_fields = [field for field in added_fields
+                 if field not in timing_fields and field != "Same Page As Row"]
 
-# Create a regular expression for spaces, tabs, and new line characters.
-space_re = re.compile(r"\s")
+# Keep the timings of the page each thread is working on.
+timer = threading.local()
 
-for page in pages:
+"""
+This function starts timing a new page in the current thread and returns
+    the dictionary the timings are kept in."""
+def start_timing():
+    timer.timings = {}
+    return timer.timings
+
+"""
+This function adds an amount, such as a number of seconds, to a timing for
+    the page the current thread is working on."""
+def add_timing(name, amount):
+    timings = getattr(timer, "timings", None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + amount
+
+"""
+These classes are connections to websites that record how long it takes to
+    connect, including the secure handshake for HTTPS. A connection that
+    is reused for another page from the same website does not connect
+    again, so the connect time for that page is 0."""
+class TimedConnection:
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        add_timing("Connect Seconds", time.perf_counter() - start)
+
+class TimedHTTPConnection(TimedConnection, urllib3.connection.HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnection,
+                           urllib3.connection.HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+# Create a session so that connections to the same website are reused
+    # rather than opened again for every URL. Allow as many pooled
+    # connections per website as there can be pages checked at once.
+session = requests.Session()
+adapter = requests.adapters.HTTPAdapter(
+    pool_maxsize = max(max_concurrent_requests, 10))
+if record_timings:
+    adapter.poolmanager.pool_classes_by_scheme = {
+        "http": TimedHTTPConnectionPool,
+        "https": TimedHTTPSConnectionPool}
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+# Create the cache folder if it does not exist yet.
+if use_cache or content_memory_size and save_content_memory:
+    os.makedirs(cache_path, exist_ok = True)
+
+"""
+This function returns the start of the path of the cache files for a URL.
+    Each URL gets a JSON file, which holds the status, headers, and time
+    it was fetched, and a file that holds the body of the response."""
+def cache_file_stem(url):
+    return os.path.join(cache_path,
+                        hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+"""
+This function saves a response to the cache. The files are written under
+    temporary names first so that a run that is interrupted partway
+    through a write never leaves a damaged copy behind."""
+def save_to_cache(url, response, fetch_time):
+    stem = cache_file_stem(url)
+    record = {"URL": url,
+              "Final URL": response.url,
+              "Status": response.status_code,
+              "Reason": response.reason,
+              "Encoding": response.encoding,
+              "Headers": dict(response.headers),
+              "Fetch Time": fetch_time}
+    with open(stem + ".body.tmp", "wb") as file:
+        file.write(response.content)
+    with open(stem + ".json.tmp", "w", encoding = "utf-8") as file:
+        json.dump(record, file)
+    os.replace(stem + ".body.tmp", stem + ".body")
+    os.replace(stem + ".json.tmp", stem + ".json")
+
+"""
+This function loads a response from the cache. It returns the response
+    and the time it was fetched, or None if the URL is not in the
+    cache."""
+def load_from_cache(url):
+    stem = cache_file_stem(url)
     try:
-        # Scrape the page.
-        response = requests.get(page["URL"])
-        data = response.text
-        soup = BeautifulSoup(data, "lxml")
-        # Identify the page title, if possible.
+        with open(stem + ".json", encoding = "utf-8") as file:
+            record = json.load(file)
+        with open(stem + ".body", "rb") as file:
+            body = file.read()
+    except (OSError, ValueError):
+        return None
+    # Rebuild the response so the rest of the program can use it just
+        # like a response that was downloaded.
+    response = requests.Response()
+    response.url = record["Final URL"]
+    response.status_code = record["Status"]
+    response.reason = record["Reason"]
+    response.encoding = record["Encoding"]
+    response.headers = requests.structures.CaseInsensitiveDict(
+        record["Headers"])
+    response._content = body
+    return response, record["Fetch Time"]
+
+# Specify the file in which the remembered results are saved, and create a
+    # code for the terms being looked for, so that results saved while
+    # looking for other terms are not used.
+content_memory_file = os.path.join(cache_path, "content-memory.json")
+terms_hash = hashlib.sha256(combined_re.pattern.encode("utf-8")).hexdigest()
+
+"""
+This function returns a code for the text of a page that is the same for
+    every page with exactly the same text, even if the pages were sent in
+    different encodings. The page can be text, or bytes in an encoding
+    that bytes_encoding accepts."""
+def content_hash(data, encoding = None):
+    # The bytes of a page in UTF-8, or of a page with only ASCII
+        # characters, are already the bytes the code is made from, so they
+        # do not need to be decoded.
+    if encoding is not None and (encoding == "utf-8" or data.isascii()):
+        return hashlib.sha256(data).hexdigest()
+    if encoding is not None:
+        data = data.decode(encoding, errors = "replace")
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+"""
+This class remembers the title and results of the most recently checked
+    pages by the code for their content. Once it holds size pages, it
+    forgets the page that was used longest ago to make room for each new
+    one. Several download threads can use it at once."""
+class ContentMemory:
+    def __init__(self, size):
+        self.size = size
+        self.pages = collections.OrderedDict()
+        self.lock = threading.Lock()
+        # Count the pages that did not need to be checked.
+        self.reused = 0
+
+    # Return the title and results for a code, or None if there are none.
+    def get(self, digest):
+        with self.lock:
+            if digest not in self.pages:
+                return None
+            self.pages.move_to_end(digest)
+            self.reused += 1
+            return self.pages[digest]
+
+    def add(self, digest, title, results):
+        with self.lock:
+            self.pages[digest] = (title, results)
+            self.pages.move_to_end(digest)
+            while len(self.pages) > self.size:
+                self.pages.popitem(last = False)
+
+    # Load the results saved by an earlier run, unless they were found
+        # while looking for other terms.
+    def load(self):
         try:
-            title = soup.title.string
-            # Polish up the title.
-            # Identify space-like characters in the title.
-            title_spaces = space_re.findall(title)
-            # Replace all space-like characters in the title with
-                # spaces.
-            for i in title_spaces:
-                title = title.replace(i, " ")
-            # Replace all double spaces in the title. I am embedding the
-                # replace function within a while loop to account for,
-                # e.g., quadruple spaces.
-            while "  " in title:
-                title = title.replace("  ", " ")
-            # Remove leading and trailing spaces from the title.
-            title = title.strip()
-        except:
-            title = "N/A"
-        # Add a field for the scraped title to the dictionary for the
-            # page.
-        page["Scraped Title"] = title
-        # Add a field to indicate whether the program was able to
-            # connect with the site successfully.
-        page["Scrape Response"] = response
-        check_matches(data, page)
-    except:
-        continue
-    print(str(n) + " out of " + str(len(pages)) + " URLs checked")
-    # Add one to the variable counting how many pages the program has
-        # checked so far.
-    n += 1
-    # Wait five seconds to avoid the program being flagged as a bot.
-    time.sleep(5)
-
-# Create a new dataframe.
-df = pd.DataFrame(pages)
-# Create a timestamp for the filename.
-timestamp = str(datetime.datetime.today())[:19].replace(
-    ":", "").replace(" ", "_")
-# Create the filename.
-filename = "cim-matches_" + timestamp + ".csv"
-# Write the dataframe to a CSV file.
-df.to_csv(filename,
-          encoding = "utf-8-sig",
-          index = False)
+            with open(content_memory_file, encoding = "utf-8") as file:
+                saved = json.load(file)
+            if saved["Terms Hash"] != terms_hash:
+                return
+            pages = saved["Pages"]
+        except (OSError, ValueError, KeyError):
+            return
+        for digest, title, results in pages[-self.size:]:
+            self.pages[digest] = (title, results)
+
+    # Save the results, oldest first, under a temporary name first so that
+        # the file is never left half-written.
+    def save(self):
+        saved = {"Terms Hash": terms_hash,
+                 "Pages": [[digest, title, results] for digest, (title,
+                           results) in self.pages.items()]}
+        with open(content_memory_file + ".tmp", "w",
+                  encoding = "utf-8") as file:
+            json.dump(saved, file)
+        os.replace(content_memory_file + ".tmp", content_memory_file)
+
+content_memory = ContentMemory(content_memory_size)
+
+"""
+This exception means that a page was not checked because of what kind of
+    file it is or its size. It keeps the response and the reason, which
+    is added under "Content Status"."""
+class SkippedPage(Exception):
+    def __init__(self, response, reason):
+        super().__init__(reason)
+        self.response = response
+        self.reason = reason
+
+"""
+This function looks at the headers of a response, before the rest of it
+    is downloaded, and raises SkippedPage if it is not a webpage, text, or
+    a PDF that can be checked, or if it is larger than largest_file_bytes,
+    using skip_reason in cim_core.py. It returns "PDF" for a PDF that can
+    be checked and None for anything else."""
+def check_content(response):
+    if not check_content_types:
+        return None
+    reason = skip_reason(response.headers, largest_file_bytes, check_pdfs)
+    if reason is not None:
+        raise SkippedPage(response, reason)
+    if content_kind(response.headers) == "application/pdf":
+        return "PDF"
+    return None
+
+# Limit how many PDFs are read at the same time.
+pdf_slots = threading.BoundedSemaphore(pdf_workers)
+
+"""
+This function checks a PDF, given as bytes, in a separate process. Like
+    parse_page, it returns the title, a dictionary with the results, and
+    a dictionary with how long it took, which all counts as reading the
+    page. If the PDF cannot be checked, the results only say why."""
+def parse_pdf(data, digest = None):
+    start = time.perf_counter()
+    results = {}
+    try:
+        with pdf_slots:
+            title, matches, note, finished = find_matches_in_pdf(
+                data, pdf_page_limit, pdf_seconds)
+        results["Content Status"] = "Checked (" + note + ")"
+        # Do not remember a PDF that ran out of time, since it might get
+            # further next time.
+        if digest is not None and finished:
+            results["Content Hash"] = digest
+        record_matches(matches, results)
+    except PdfError as error:
+        title = "N/A"
+        results["Content Status"] = "Could not check PDF (" + str(error) + ")"
+    return title, results, {"Parse Seconds": time.perf_counter() - start}
+
+"""
+This function downloads a page without the cache, timing how long it takes
+    for the first byte of the response to arrive and for the rest of it to
+    download."""
+def download_page(url, headers = None):
+    start = time.perf_counter()
+    response = session.get(url, headers = headers, stream = True,
+                           timeout = request_timeout)
+    add_timing("First Byte Seconds", time.perf_counter() - start)
+    # Stop before downloading the rest of a file that will not be checked.
+    try:
+        check_content(response)
+    except SkippedPage:
+        response.close()
+        raise
+    start = time.perf_counter()
+    content = response.content
+    add_timing("Download Seconds", time.perf_counter() - start)
+    add_timing("Bytes Received", len(content))
+    return response
+
+"""
+This function downloads a page, using the cache if it is turned on. A
+    saved copy that is newer than cache_hours is used without contacting
+    the website. An older saved copy is used only if the website confirms
+    that the page has not changed since."""
+def get_page(url):
+    if not use_cache:
+        return download_page(url)
+    cached = load_from_cache(url)
+    headers = {}
+    if cached is not None:
+        cached_response, fetch_time = cached
+        if time.time() - fetch_time < cache_hours * 60 * 60:
+            return cached_response
+        # Ask the website to send the page only if it has changed.
+        if "ETag" in cached_response.headers:
+            headers["If-None-Match"] = cached_response.headers["ETag"]
+        if "Last-Modified" in cached_response.headers:
+            headers["If-Modified-Since"] = (
+                cached_response.headers["Last-Modified"])
+    response = download_page(url, headers)
+    if cached is not None and response.status_code == 304:
+        # The page has not changed, so reuse the saved copy and restart
+            # its clock.
+        save_to_cache(url, cached_response, time.time())
+        return cached_response
+    # Only save successful responses, so that pages that failed are
+        # tried again on the next run.
+    if response.ok:
+        save_to_cache(url, response, time.time())
+    return response
+
+"""
+This function identifies the title of a page and checks the text of the
+    page for matches. The page can be text, or bytes in encoding if
+    page_encoding returned one, which are checked without decoding all of
+    them. It returns the title, a dictionary with the results, including
+    the code for the content if there is one, and a dictionary with how
+    long each step took. It only uses what it is given, so it can run in
+    a separate process."""
+def parse_page(data, digest = None, encoding = None):
+    start = time.perf_counter()
+    if encoding is None:
+        title = get_title(data)
+    else:
+        title = get_title_from_bytes(data, encoding)
+    parse_seconds = time.perf_counter() - start
+    results = {}
+    if check_content_types:
+        results["Content Status"] = "Checked"
+    if digest is not None:
+        results["Content Hash"] = digest
+    start = time.perf_counter()
+    if encoding is None:
+        check_matches(data, results)
+    else:
+        record_matches(find_matches_in_bytes(data, encoding), results)
+    timings = {"Parse Seconds": parse_seconds,
+               "Match Seconds": time.perf_counter() - start}
+    return title, results, timings
+
+"""
+This function downloads a page a chunk at a time and checks each chunk for
+    the title and for matches as it arrives, so that only about one chunk
+    of the page is in memory at once. It stops once max_page_bytes have
+    been downloaded. Like parse_page, it returns the title, the results,
+    which also say whether the page was truncated, and the timings, but
+    it returns them in a tuple along with the response."""
+def stream_page(url):
+    timings = {}
+    start = time.perf_counter()
+    response = session.get(url, stream = True, timeout = request_timeout)
+    timings["First Byte Seconds"] = time.perf_counter() - start
+    try:
+        kind = check_content(response)
+    except SkippedPage:
+        response.close()
+        raise
+    # A PDF cannot be read until all of it has arrived, so download the
+        # whole PDF before checking it.
+    if kind == "PDF":
+        start = time.perf_counter()
+        data = response.content
+        timings["Download Seconds"] = time.perf_counter() - start
+        timings["Bytes Received"] = len(data)
+        digest = None
+        if content_memory_size:
+            digest = hashlib.sha256(data).hexdigest()
+        title, results, pdf_timings = parse_pdf(data, digest)
+        timings.update(pdf_timings)
+        return response, (title, results, timings)
+    # Time downloading, reading, and checking the page separately, even
+        # though they take turns.
+    for name in ("Download Seconds", "Parse Seconds", "Match Seconds"):
+        timings[name] = 0
+    # Decode the text as it arrives. If the website does not say how the
+        # page is encoded, assume UTF-8.
+    try:
+        decoder = codecs.getincrementaldecoder(
+            response.encoding or "utf-8")(errors = "replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors = "replace")
+    title_parser = TitleParser()
+    scanner = MatchScanner()
+    hasher = hashlib.sha256()
+    received = 0
+    truncated = False
+    with response:
+        start = time.perf_counter()
+        for chunk in response.iter_content(chunk_size):
+            timings["Download Seconds"] += time.perf_counter() - start
+            if max_page_bytes and received + len(chunk) > max_page_bytes:
+                chunk = chunk[:max_page_bytes - received]
+                truncated = True
+            received += len(chunk)
+            start = time.perf_counter()
+            text = decoder.decode(chunk)
+            title_parser.feed_text(text)
+            hasher.update(text.encode("utf-8"))
+            timings["Parse Seconds"] += time.perf_counter() - start
+            start = time.perf_counter()
+            scanner.feed(text)
+            timings["Match Seconds"] += time.perf_counter() - start
+            if truncated:
+                break
+            start = time.perf_counter()
+    start = time.perf_counter()
+    text = decoder.decode(b"", final = True)
+    title_parser.feed_text(text)
+    hasher.update(text.encode("utf-8"))
+    title = title_parser.title()
+    timings["Parse Seconds"] += time.perf_counter() - start
+    start = time.perf_counter()
+    scanner.feed(text)
+    results = {}
+    record_matches(scanner.close(), results)
+    timings["Match Seconds"] += time.perf_counter() - start
+    timings["Bytes Received"] = received
+    results["Truncated"] = "Yes" if truncated else "No"
+    if check_content_types:
+        results["Content Status"] = "Checked"
+    if content_memory_size:
+        results["Content Hash"] = hasher.hexdigest()
+    return response, (title, results, timings)
+
+"""
+This function adds the response, the title, and the results for a page to
+    the dictionary for the page, along with the timings if record_timings
+    is True. The timings from downloading the page and from parse_page or
+    stream_page are added together."""
+def add_results(page, response, parsed, timings):
+    title, results, parse_timings = parsed
+    # Add a field for the scraped title to the dictionary for the page.
+    page["Scraped Title"] = title
+    # Add a field to indicate whether the program was able to connect
+        # with the site successfully.
+    page["Scrape Response"] = response
+    page.update(results)
+    # Remember the results of a page that was checked, unless it was
+        # streamed, since then it may have been cut short.
+    if "Content Hash" in results and parse_timings and not stream_pages:
+        content_memory.add(results["Content Hash"], title, results)
+    if record_timings:
+        for name, amount in parse_timings.items():
+            timings[name] = timings.get(name, 0) + amount
+        # Leave a timing blank if the step did not happen, for example
+            # because the page came from the cache.
+        for field in timing_fields:
+            page[field] = round(timings[field], 4) if field in timings else ""
+
+"""
+This function notes in the dictionary for a page why the page could not be
+    scraped, if record_timings is True."""
+def add_error(page, error):
+    if record_timings:
+        page["Error"] = type(error).__name__ + ": " + str(error)
+
+"""
+This function scrapes a page, identifies its title, and checks its text
+    for matches, adding the results to the dictionary for the page. It
+    returns whether a request was sent to the website, which is not the
+    case for a page that came straight from the cache."""
+def scrape_page(page):
+    response, parsed, timings = fetch_page(page, None)
+    add_results(page, response, parsed, timings)
+    # The time to the first byte is only recorded when a request is sent.
+    return "First Byte Seconds" in timings
+
+"""
+This function scrapes a page and returns whether it was scraped and
+    whether a request was sent to the website. If the page could not be
+    scraped, both are False."""
+def try_scrape_page(page):
+    try:
+        return True, scrape_page(page)
+    # Catch only errors, so that pressing Ctrl+C still stops the program
+        # (and the run can be resumed later).
+    except Exception as error:
+        add_error(page, error)
+        return False, False
+
+"""
+This function downloads a page. If there is a pool of parse workers, it
+    hands the page to them and returns the response, a future
+    for the title, results, and timings from parse_page, and the timings
+    of the download, without waiting for the workers to finish, so that
+    it can move on to the next download. Otherwise, it returns the
+    response, the title, results, and timings themselves, and the timings
+    of the download. If the page is skipped because of what kind of file
+    it is or its size, the results only say why."""
+def fetch_page(page, parse_pool):
+    timings = start_timing()
+    try:
+        if stream_pages:
+            return stream_page(page["URL"]) + (timings,)
+        response = get_page(page["URL"])
+        # Check the kind of file again, in case the page came from the
+            # cache.
+        kind = check_content(response)
+    # A page that is skipped has no title or matches, only the reason it
+        # was skipped.
+    except SkippedPage as skipped:
+        return (skipped.response,
+                ("N/A", {"Content Status": skipped.reason}, {}), timings)
+    # Check a PDF in a separate process, unless a PDF with exactly the same
+        # bytes has already been checked.
+    if kind == "PDF":
+        digest = None
+        if content_memory_size:
+            digest = hashlib.sha256(response.content).hexdigest()
+            remembered = content_memory.get(digest)
+            if remembered is not None:
+                return response, remembered + ({},), timings
+        return response, parse_pdf(response.content, digest), timings
+    # Count working out the characters of the page from its bytes as part
+        # of reading the page. Most pages can be checked as bytes, and
+        # only the others are decoded.
+    start = time.perf_counter()
+    encoding = page_encoding(response.encoding, response.content)
+    data = response.text if encoding is None else response.content
+    digest = None
+    if content_memory_size:
+        digest = content_hash(data, encoding)
+        # Skip checking a page with the same content as one checked
+            # before. Its reading and checking times are left blank.
+        remembered = content_memory.get(digest)
+        if remembered is not None:
+            add_timing("Parse Seconds", time.perf_counter() - start)
+            return response, remembered + ({},), timings
+    add_timing("Parse Seconds", time.perf_counter() - start)
+    if parse_pool is None:
+        return response, parse_page(data, digest, encoding), timings
+    return (response, parse_pool.submit(parse_page, data, digest, encoding),
+            timings)
+
+"""
+This function waits for a page that was passed to fetch_page to be
+    downloaded and checked, and adds the results to the dictionary for
+    the page. It returns True, or False if the page could not be
+    scraped."""
+def finish_page(page, future):
+    try:
+        response, parsed, timings = future.result()
+        if isinstance(parsed, concurrent.futures.Future):
+            parsed = parsed.result()
+    # Catch only errors, so that pressing Ctrl+C still stops the program.
+    except Exception as error:
+        add_error(page, error)
+        return False
+    add_results(page, response, parsed, timings)
+    return True
+
+# List the status codes that mean a website is busy or having a temporary
+    # problem, so a URL that gets one is worth trying again.
+retry_statuses = {429, 500, 502, 503, 504}
+
+# Keep the pause that each website's robots.txt file asks for, by website.
+crawl_delays = {}
+
+"""
+This function reads a website's robots.txt file and returns the pause, in
+    seconds, that it asks for between requests (its Crawl-delay or
+    Request-rate), or 0 if it does not ask for one or cannot be read."""
+def get_crawl_delay(site):
+    try:
+        response = session.get(site + "/robots.txt",
+                               timeout = request_timeout)
+    except requests.RequestException:
+        return 0
+    if not response.ok:
+        return 0
+    parser = urllib.robotparser.RobotFileParser()
+    parser.parse(response.text.splitlines())
+    agent = session.headers.get("User-Agent", "*")
+    delay = float(parser.crawl_delay(agent) or 0)
+    rate = parser.request_rate(agent)
+    if rate is not None and rate.requests > 0:
+        delay = max(delay, rate.seconds / rate.requests)
+    return delay
+
+"""
+This function is fetch_page for schedule_by_website. The first time it
+    is called for a website, it also reads the website's robots.txt
+    file."""
+def polite_fetch_page(page, site, parse_pool):
+    if site not in crawl_delays:
+        crawl_delays[site] = get_crawl_delay(site)
+    return fetch_page(page, parse_pool)
+
+"""
+This function returns how many seconds a response asks to wait before
+    trying again, from its Retry-After header, which can be a number of
+    seconds or a date. It returns 0 if there is no such header."""
+def retry_after(response):
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return 0
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0
+    return max(0, date.timestamp() - time.time())
+
+"""
+This function checks the pages in rows website by website when
+    schedule_by_website is True. It checks pages from different websites
+    at the same time, but only one page from each website at a time,
+    with a pause between them, using the threads of executor to download
+    them. Like scrape_pages, it yields the row number, the dictionary for
+    the page, and whether the page was scraped, but in the order the
+    pages are finished. It takes rows from rows only as they are needed,
+    keeping at most max_waiting_rows of them waiting at once."""
+def schedule_pages(rows, executor, parse_pool):
+    rows = iter(rows)
+    more_rows = True
+    # Keep the rows waiting for each website, and count them.
+    queues = {}
+    waiting_rows = 0
+    # Keep the websites that have pages waiting and none in progress in a
+        # heap, sorted by the earliest time their next page can be
+        # checked. A number that counts up keeps websites that are ready at
+        # the same time in the order they were added.
+    ready = []
+    number = 0
+    in_progress = {}
+    busy = set()
+    # Keep the earliest time the next page can be checked for websites
+        # that have no pages waiting, in case more of their rows come
+        # later.
+    next_start = {}
+    while True:
+        # Take rows until max_waiting_rows are waiting or there are no more.
+        while more_rows and waiting_rows < max_waiting_rows:
+            try:
+                row_number, page = next(rows)
+            except StopIteration:
+                more_rows = False
+                break
+            site = website(page["URL"])
+            if site not in queues:
+                queues[site] = collections.deque()
+                if site not in busy:
+                    number += 1
+                    heapq.heappush(ready, (next_start.pop(site, 0), number,
+                                           site))
+            queues[site].append((row_number, page, 0))
+            waiting_rows += 1
+        if not ready and not in_progress:
+            break
+        # Start as many ready websites as there is room for.
+        while (ready and ready[0][0] <= time.monotonic() and
+               len(in_progress) < max_concurrent_requests):
+            start, site_number, site = heapq.heappop(ready)
+            row_number, page, attempt = queues[site].popleft()
+            waiting_rows -= 1
+            busy.add(site)
+            future = executor.submit(polite_fetch_page, page, site,
+                                     parse_pool)
+            in_progress[future] = (site, row_number, page, attempt)
+        # Wait until a page is finished or the next website is ready.
+        timeout = None
+        if ready and len(in_progress) < max_concurrent_requests:
+            timeout = max(0, ready[0][0] - time.monotonic())
+        if not in_progress:
+            time.sleep(timeout)
+            continue
+        finished, unfinished = concurrent.futures.wait(
+            in_progress, timeout = timeout,
+            return_when = concurrent.futures.FIRST_COMPLETED)
+        for future in finished:
+            site, row_number, page, attempt = in_progress.pop(future)
+            busy.discard(site)
+            wait = max(host_delay, crawl_delays.get(site, 0))
+            # Check whether the website was busy or did not respond.
+            retry = False
+            try:
+                response = future.result()[0]
+                if response.status_code in retry_statuses:
+                    retry = True
+                    wait = max(wait, retry_after(response))
+            except (requests.ConnectionError, requests.Timeout):
+                retry = True
+            except Exception:
+                pass
+            if retry and attempt < max_retries:
+                wait = max(wait, backoff_seconds * 2 ** attempt)
+                retry = wait <= longest_wait
+            else:
+                retry = False
+            if retry:
+                print("Trying " + page["URL"] + " again in " +
+                      str(round(wait)) + " seconds")
+                queues[site].appendleft((row_number, page, attempt + 1))
+                waiting_rows += 1
+            else:
+                yield row_number, page, finish_page(page, future)
+            # Schedule the website's next page, or remember when it can be
+                # checked if more of its rows come later.
+            next_time = time.monotonic() + min(wait, longest_wait)
+            if queues[site]:
+                number += 1
+                heapq.heappush(ready, (next_time, number, site))
+            else:
+                del queues[site]
+                next_start[site] = next_time
+        # Forget the times that have already passed, so that next_start
+            # does not keep growing.
+        if len(next_start) > max_waiting_rows:
+            now = time.monotonic()
+            next_start = {site: next_time for site, next_time
+                          in next_start.items() if next_time > now}
+
+"""
+This function starts a pool of parse workers and returns it, or returns
+    None if parse_workers is 0. Like the processes that read PDFs, the
+    workers start from scratch rather than as copies of the program,
+    since copying a program that is downloading pages in several threads
+    at once can leave the copy stuck."""
+def start_parse_pool():
+    if parse_workers > 0:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers = parse_workers,
+            mp_context = multiprocessing.get_context("spawn"))
+    return None
+
+"""
+This function reads a source CSV file, skipping the row numbers in done,
+    and finds the rows whose pages also appear in an earlier row. It
+    returns a dictionary that gives, for each of those rows, the row
+    number of the earlier row, or the canonical URL of the page if it
+    appeared in an earlier file, which checked_pages has the results of.
+    checked_pages is a dictionary of the pages checked so far in a batch
+    of files, by their canonical URLs."""
+def find_duplicates(source, done, checked_pages):
+    first_rows = {}
+    duplicate_of = {}
+    with open(source, encoding = "utf-8-sig") as file:
+        reader = csv.DictReader(file, skipinitialspace = True)
+        for row_number, page in enumerate(reader):
+            if row_number in done:
+                continue
+            url = canonical_url(page["URL"])
+            if url in checked_pages:
+                duplicate_of[row_number] = url
+                continue
+            first_row = first_rows.setdefault(url, row_number)
+            if first_row != row_number:
+                duplicate_of[row_number] = first_row
+    return duplicate_of
+
+"""
+This function passes along the rows that are not repeats of earlier rows.
+    It sets the repeated rows aside in waiting, by the row number of the
+    earlier row, or in ready if the earlier row is already finished."""
+def set_aside_duplicates(rows, duplicate_of, shared, waiting, ready):
+    for row_number, page in rows:
+        if row_number not in duplicate_of:
+            yield row_number, page
+        elif duplicate_of[row_number] in shared:
+            heapq.heappush(ready, (row_number, page))
+        else:
+            waiting.setdefault(duplicate_of[row_number], []).append(
+                (row_number, page))
+
+"""
+This function reads the rows of a source CSV file one at a time, skipping
+    the row numbers in done, and scrapes each page with check_pages,
+    except that rows whose row numbers are in duplicate_of get the results
+    of the earlier row with the same page instead. For each row, it yields
+    the row number, the dictionary for the page, and whether the page was
+    scraped, in the same order as the rows of the source CSV file unless
+    schedule_by_website is True."""
+def scrape_pages(source, done, duplicate_of, checked_pages, executor,
+                 parse_pool):
+    # Keep the results of pages that later rows repeat, until every one of
+        # those rows is finished. The results of pages from earlier files
+        # are ready from the start.
+    copies_left = collections.Counter(duplicate_of.values())
+    shared = {first_row: checked_pages[first_row]
+              for first_row in copies_left if isinstance(first_row, str)}
+    # Keep the repeated rows that are waiting for their earlier row to be
+        # finished, and the ones that are ready to be written, sorted by
+        # row number.
+    waiting = {}
+    ready = []
+    with open(source, encoding = "utf-8-sig") as file:
+        rows = enumerate(csv.DictReader(file, skipinitialspace = True))
+        rows = ((row_number, page) for row_number, page in rows
+                if row_number not in done)
+        rows = set_aside_duplicates(rows, duplicate_of, shared, waiting,
+                                    ready)
+        for row_number, page, scraped in check_pages(rows, executor,
+                                                     parse_pool):
+            # Keep the rows in order, unless they are finished out of
+                # order anyway.
+            while ready and (schedule_by_website or ready[0][0] < row_number):
+                yield copy_results(*heapq.heappop(ready), duplicate_of,
+                                   shared, copies_left)
+            yield row_number, page, scraped
+            if row_number in copies_left:
+                shared[row_number] = (results_to_copy(page), scraped)
+                for duplicate in waiting.pop(row_number, []):
+                    heapq.heappush(ready, duplicate)
+        while ready:
+            yield copy_results(*heapq.heappop(ready), duplicate_of, shared,
+                               copies_left)
+
+"""
+This function returns the fields of a page that are copied to the rows
+    that repeat it. The response is kept as the text written to the
+    output CSV file, since the response itself holds the whole page."""
+def results_to_copy(page):
+    fields = {field: page.get(field, "") for field in copied_fields}
+    fields["Scrape Response"] = str(fields["Scrape Response"])
+    return fields
+
+"""
+This function copies the results of the earlier row with the same page to
+    a repeated row. It returns the row number, the dictionary for the
+    page, and whether the earlier page was scraped, like scrape_pages."""
+def copy_results(row_number, page, duplicate_of, shared, copies_left):
+    first_row = duplicate_of[row_number]
+    fields, scraped = shared[first_row]
+    page.update(fields)
+    # Number the row as it appears in a spreadsheet, where the field names
+        # are row 1. The results of a page from an earlier file already
+        # say which row and file it came from.
+    if isinstance(first_row, int):
+        page["Same Page As Row"] = first_row + 2
+    copies_left[first_row] -= 1
+    if copies_left[first_row] == 0:
+        del shared[first_row]
+    return row_number, page, scraped
+
+"""
+This function checks the pages in rows, which yields a row number and the
+    dictionary for each page, and yields the row number, the dictionary,
+    and whether the page was scraped, in the same order as rows unless
+    schedule_by_website is True. The threads of executor download the
+    pages and the processes of parse_pool check them, if there are any."""
+def check_pages(rows, executor, parse_pool):
+    if schedule_by_website:
+        yield from schedule_pages(rows, executor, parse_pool)
+    elif check_concurrently:
+        # Download several pages at the same time and, if there are
+            # parse workers, check the downloaded pages in separate
+            # processes while the next ones download. Only a limited
+            # number of pages are in progress at once, so that neither
+            # stage can run far ahead of the other and memory use does
+            # not grow with the size of the CSV file.
+        in_progress = collections.deque()
+        for row_number, page in rows:
+            in_progress.append(
+                (row_number, page,
+                 executor.submit(fetch_page, page, parse_pool)))
+            if (len(in_progress) >=
+                    max_concurrent_requests * 2 + parse_workers):
+                row_number, page, future = in_progress.popleft()
+                yield row_number, page, finish_page(page, future)
+        while in_progress:
+            row_number, page, future = in_progress.popleft()
+            yield row_number, page, finish_page(page, future)
+    else:
+        for row_number, page in rows:
+            scraped, requested = try_scrape_page(page)
+            yield row_number, page, scraped
+            if requested:
+                # Wait five seconds to avoid the program being flagged
+                    # as a bot. A page from the cache needs no wait.
+                time.sleep(5)
+
+"""
+This function finds the most recent journal that starts with a line
+    giving the path of source, which is a source CSV file for the journal
+    of a run and the name pattern for the journal of a batch. It returns
+    the path of the journal, or None if there is none."""
+def find_journal(source, pattern = "cim-matches_*.journal"):
+    journals = glob.glob(os.path.join(destination_path, pattern))
+    for journal in sorted(journals, key = os.path.getmtime, reverse = True):
+        with open(journal, encoding = "utf-8") as file:
+            if file.readline().rstrip("\n") == os.path.abspath(source):
+                return journal
+    return None
+
+"""
+This function reads a journal. Each line after the first lists a row
+    number, the size of the output CSV file after that row was written,
+    and the URL, separated by tabs. It returns the set of row numbers
+    that are finished and the size of the output CSV file after the last
+    of them was written. A last line that was only partly written when
+    the run was interrupted is ignored."""
+def read_journal(journal):
+    done = set()
+    size = 0
+    with open(journal, encoding = "utf-8") as file:
+        file.readline()
+        for line in file:
+            parts = line.split("\t", 2)
+            if not line.endswith("\n") or len(parts) < 3:
+                continue
+            done.add(int(parts[0]))
+            size = int(parts[1])
+    return done, size
+
+"""
+This function returns the value below which a percentage of a sorted list
+    of numbers falls, using the nearest value in the list."""
+def percentile(values, percent):
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+"""
+This class keeps track of the timings of every page checked during a run
+    when record_timings is True, and shows a summary of them at the end of
+    the run: how long the steps of checking a page usually took, how fast
+    the run was, which websites were slowest, and which errors happened
+    how often. The timings are kept in arrays rather than lists, so that
+    a run with many pages does not use much memory."""
+class RunSummary:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.pages = 0
+        self.bytes = 0
+        self.times = {field: array.array("d") for field in timing_fields
+                      if field != "Bytes Received"}
+        self.times["Total Seconds"] = array.array("d")
+        self.host_seconds = collections.Counter()
+        self.host_pages = collections.Counter()
+        self.errors = collections.Counter()
+
+    def add(self, page):
+        self.pages += 1
+        if page.get("Error"):
+            # Keep only the kind of error, not the details.
+            self.errors[page["Error"].split(":")[0]] += 1
+            return
+        response = page.get("Scrape Response")
+        if getattr(response, "status_code", 0) >= 400:
+            self.errors["HTTP " + str(response.status_code)] += 1
+        if page["Bytes Received"] != "":
+            self.bytes += page["Bytes Received"]
+        # The first byte timing includes connecting, so it is not added
+            # again.
+        total = 0
+        for field, values in self.times.items():
+            if field != "Total Seconds" and page[field] != "":
+                values.append(page[field])
+                if field != "Connect Seconds":
+                    total += page[field]
+        self.times["Total Seconds"].append(total)
+        host = urllib.parse.urlsplit(page["URL"]).hostname or page["URL"]
+        self.host_seconds[host] += total
+        self.host_pages[host] += 1
+
+    def show(self):
+        seconds = time.perf_counter() - self.start
+        print()
+        print("Summary of this run:")
+        print(f"{self.pages} URLs in {seconds:.1f} seconds "
+              f"({self.pages / seconds:.2f} URLs per second, "
+              f"{self.bytes / 1000000 / seconds:.2f} MB per second)")
+        print()
+        print(f"{'Step':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'Total':>12}")
+        for field, values in self.times.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            print(f"{field.replace(' Seconds', ''):<20}" +
+                  "".join(f"{percentile(ordered, percent):10.3f}"
+                          for percent in (50, 95, 99)) +
+                  f"{sum(ordered):12.1f}")
+        # Show whether the run spent more time on the network or on
+            # checking the pages.
+        network = (sum(self.times["First Byte Seconds"]) +
+                   sum(self.times["Download Seconds"]))
+        checking = (sum(self.times["Parse Seconds"]) +
+                    sum(self.times["Match Seconds"]))
+        if network or checking:
+            print(f"{network / (network + checking):.0%} of the time was "
+                  f"spent on the network and "
+                  f"{checking / (network + checking):.0%} on checking "
+                  f"the pages.")
+        if self.host_pages:
+            print()
+            print("Slowest websites (average seconds per page):")
+            averages = sorted(((self.host_seconds[host] / count, host, count)
+                               for host, count in self.host_pages.items()),
+                              reverse = True)
+            for average, host, count in averages[:5]:
+                print(f"    {host}: {average:.3f} ({count} pages)")
+        if self.errors:
+            print()
+            print("Errors:")
+            for error, count in self.errors.most_common():
+                print(f"    {error}: {count}")
+
+"""
+This function checks the pages in one source CSV file and writes the
+    output CSV file for it, resuming its unfinished run if resuming is
+    True and there is one. The pages are downloaded by the threads of
+    executor and checked by the processes of parse_pool, and the timings
+    are added to summary. If batch is True, the name of the source CSV
+    file is added to the name of the output CSV file, and the results of
+    the pages are added to checked_pages so that later files do not
+    check them again."""
+def check_file(source, resuming, batch, executor, parse_pool, summary,
+               checked_pages):
+    # Count the pages in the search results CSV file and list its fields.
+        # The rows themselves are read one at a time later, so that the
+        # file never needs to fit in memory all at once.
+    with open(source, encoding = "utf-8-sig") as file:
+        reader = csv.DictReader(file, skipinitialspace = True)
+        page_count = sum(1 for row in reader)
+        field_names = reader.fieldnames + [field for field in added_fields
+                                           if field not in reader.fieldnames]
+    if "URL" not in field_names:
+        raise ValueError("The file has no field named URL.")
+
+    # Find the run to resume, if any.
+    journal_name = None
+    if resuming:
+        journal_name = find_journal(source)
+        # In a batch, files that were not started yet have no run to
+            # resume, which is expected.
+        if journal_name is None and not batch:
+            print("There is no unfinished run on " + source +
+                  " to resume, so a new run will start.")
+
+    if journal_name is not None:
+        # Continue the interrupted run. Cut off anything written to the
+            # output CSV file after the last finished row, and rewrite the
+            # journal without any partly written line.
+        filename = journal_name[:-len(".journal")] + ".csv"
+        done, size = read_journal(journal_name)
+        with open(filename, "r+b") as file:
+            file.truncate(size)
+        with open(journal_name, encoding = "utf-8") as file:
+            lines = [line for line in file if line.endswith("\n")]
+        with open(journal_name, "w", encoding = "utf-8") as file:
+            file.writelines(lines)
+        print("Resuming " + filename + " after " + str(len(done)) +
+              " finished URLs.")
+    else:
+        # Start a new run.
+        done = set()
+        size = 0
+        # Create a timestamp for the filename.
+        timestamp = str(datetime.datetime.today())[:19].replace(
+            ":", "").replace(" ", "_")
+        # Create the filename. In a batch, several files can start in the
+            # same second, so the name of the source CSV file tells them
+            # apart.
+        if batch:
+            timestamp = Path(source).stem + "_" + timestamp
+        filename = os.path.join(destination_path,
+                                "cim-matches_" + timestamp + ".csv")
+        journal_name = filename[:-len(".csv")] + ".journal"
+        with open(journal_name, "w", encoding = "utf-8") as file:
+            file.write(os.path.abspath(source) + "\n")
+
+    # Create a variable to keep track of how many pages the program has
+        # checked.
+    n = len(done) + 1
+
+    # Write each page to the output CSV file as soon as it has been checked.
+        # The file only gets a byte order mark and field names when it is
+        # new.
+    if size == 0:
+        output_file = open(filename, "w", encoding = "utf-8-sig", newline = "")
+    else:
+        output_file = open(filename, "a", encoding = "utf-8", newline = "")
+    # Find the rows that repeat the page of an earlier row.
+    duplicate_of = {}
+    if deduplicate_urls:
+        duplicate_of = find_duplicates(source, done, checked_pages)
+        earlier_files = sum(1 for first_row in duplicate_of.values()
+                            if isinstance(first_row, str))
+        if len(duplicate_of) > earlier_files:
+            print(str(len(duplicate_of) - earlier_files) + " rows repeat " +
+                  "the page of an earlier row, so their pages will not " +
+                  "be checked again.")
+        if earlier_files:
+            print(str(earlier_files) + " rows repeat a page from an " +
+                  "earlier file, so their pages will not be checked again.")
+
+    # Save the results in the database too, if asked to.
+    if use_database:
+        store = ResultStore(database_path, os.path.abspath(source),
+                            os.path.abspath(filename),
+                            batch_size = database_batch_size)
+    else:
+        store = contextlib.nullcontext()
+
+    with output_file, open(journal_name, "a", encoding = "utf-8") as journal, \
+         store:
+        writer = csv.DictWriter(output_file, fieldnames = field_names)
+        if size == 0:
+            writer.writeheader()
+        for row_number, page, scraped in scrape_pages(
+                source, done, duplicate_of, checked_pages, executor,
+                parse_pool):
+            # Leave repeated rows out of the summary, since their pages
+                # were not checked again.
+            if record_timings and row_number not in duplicate_of:
+                summary.add(page)
+            writer.writerow(page)
+            output_file.flush()
+            # Record the finished row in the journal.
+            journal.write(str(row_number) + "\t" +
+                          str(output_file.buffer.tell()) + "\t" +
+                          page["URL"] + "\n")
+            journal.flush()
+            if use_database:
+                store.add(row_number, page)
+            # Keep the results of each page for the later files in the
+                # batch, along with where they came from.
+            if (batch and deduplicate_urls and
+                    row_number not in duplicate_of):
+                fields = results_to_copy(page)
+                fields["Same Page As Row"] = (str(row_number + 2) + " in " +
+                                              os.path.basename(source))
+                checked_pages.setdefault(canonical_url(page["URL"]),
+                                         (fields, scraped))
+            if scraped:
+                print(str(n) + " out of " + str(page_count) +
+                      " URLs checked")
+                # Add one to the variable counting how many pages the
+                    # program has checked so far.
+                n += 1
+        if use_database:
+            store.finish()
+
+    # The run is finished, so it no longer needs a journal.
+    os.remove(journal_name)
+    print("The results for " + source + " are in " + filename + ".")
+
+"""
+This function returns the source CSV files to check, which are the files
+    that match pattern if it has a *, ?, or [ in it, in alphabetical
+    order. The program's own output files are left out, in case they are
+    saved in the same folder."""
+def find_sources(pattern):
+    if not any(character in pattern for character in "*?["):
+        return [pattern]
+    return sorted(path for path in glob.glob(pattern)
+                  if not os.path.basename(path).startswith("cim-"))
+
+"""
+This function runs the program."""
+def main():
+    # Check whether the program was asked to resume on the command line,
+        # and whether it was given the CSV files to check.
+    arguments = sys.argv[1:]
+    resuming = resume or "--resume" in arguments
+    patterns = [argument for argument in arguments
+                if not argument.startswith("--")]
+    pattern = patterns[0] if patterns else source_csv
+    sources = find_sources(pattern)
+    batch = sources != [pattern]
+    if not sources:
+        print("There are no CSV files that match " + pattern + ".")
+        return
+
+    # When checking several files, keep track of the finished ones in a
+        # journal of their own, so that resuming skips them.
+    finished = set()
+    batch_journal = None
+    if batch:
+        if resuming:
+            batch_journal = find_journal(pattern, "cim-batch_*.journal")
+        if batch_journal is not None:
+            with open(batch_journal, encoding = "utf-8") as file:
+                file.readline()
+                finished = {line.rstrip("\n") for line in file
+                            if line.endswith("\n")}
+        else:
+            timestamp = str(datetime.datetime.today())[:19].replace(
+                ":", "").replace(" ", "_")
+            batch_journal = os.path.join(destination_path,
+                                         "cim-batch_" + timestamp +
+                                         ".journal")
+            with open(batch_journal, "w", encoding = "utf-8") as file:
+                file.write(os.path.abspath(pattern) + "\n")
+
+    summary = RunSummary()
+    if content_memory_size and save_content_memory:
+        content_memory.load()
+
+    # Start the download threads and the parse workers once, and share
+        # them among all the files, so that they are not started again for
+        # each file and connections to the websites can be reused.
+    executor = None
+    parse_pool = None
+    if schedule_by_website or check_concurrently:
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers = max_concurrent_requests)
+        parse_pool = start_parse_pool()
+    checked_pages = {}
+    failed = []
+    try:
+        for number, source in enumerate(sources, 1):
+            if os.path.abspath(source) in finished:
+                print("Skipping " + source + ", which is already finished.")
+                continue
+            if batch:
+                print("Checking " + source + " (file " + str(number) +
+                      " of " + str(len(sources)) + ")")
+            # If one file cannot be finished, go on to the next one. Its
+                # journal is kept, so that it can be resumed later.
+            try:
+                check_file(source, resuming, batch, executor, parse_pool,
+                           summary, checked_pages)
+            except Exception as error:
+                if not batch:
+                    raise
+                print("Could not finish " + source + ": " +
+                      type(error).__name__ + ": " + str(error))
+                failed.append(source)
+                continue
+            if batch:
+                with open(batch_journal, "a", encoding = "utf-8") as file:
+                    file.write(os.path.abspath(source) + "\n")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if parse_pool is not None:
+            parse_pool.shutdown()
+
+    if batch:
+        print("Finished " + str(len(sources) - len(failed)) + " of " +
+              str(len(sources)) + " CSV files.")
+        if failed:
+            print("Could not finish " + ", ".join(failed) + ". Run the " +
+                  "program again with --resume to try them again.")
+        else:
+            # The batch is finished, so it no longer needs a journal.
+            os.remove(batch_journal)
+
+    if content_memory_size:
+        if content_memory.reused:
+            print(str(content_memory.reused) + " pages had the same " +
+                  "content as a page checked before, so they were not " +
+                  "checked again.")
+        if save_content_memory:
+            content_memory.save()
+
+    if record_timings:
+        summary.show()
+
+# Run the program only when this script is started directly, not when
+    # the parse workers load it to use its functions.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+#! python3
+# cim-service.py
+
+"""
+This program keeps running in the background and checks URLs, text, and
+    files for references to AAMC's Careers in Medicine program (CiM)
+    whenever another program on the same computer asks it to. It looks
+    for the same text strings as cim-scraper.py and gives the same
+    results, but because it keeps running, it only has to start up once:
+    the regular expressions stay ready, connections to websites are
+    reused from one request to the next, and the processes that check
+    large pages are already running. Other programs, or a command such as
+    curl, can then get results for a text in milliseconds, and for a list
+    of URLs without editing any file paths.
+
+The program answers requests at http://127.0.0.1:8790 (see port below).
+    Only programs on this computer can reach it, and it only answers
+    requests addressed to 127.0.0.1 or localhost, so that a webpage open
+    in a browser cannot use it.
+
+    POST /jobs
+        Check the items in the body of the request, which is JSON (with
+        the header "Content-Type: application/json") with one of the
+        following:
+            {"urls": ["https://www.example.org/page", ...]}
+            {"text": "The text to check"}
+            {"path": "C:\\Users\\rastley\\Documents\\page.html"}
+        A path can lead to a UTF-8 text or HTML file or to a PDF. The
+        response has a line of JSON for each item, sent as soon as that
+        item has been checked, so the URLs of a long list are answered in
+        the order they are finished rather than the order they were
+        given. Each line has "Item", the item's place in the list
+        (counting from 0), and the same fields as the columns of the
+        output CSV file of cim-scraper.py. If an item could not be
+        checked, "Error" says why.
+    GET /metrics
+        Show, as JSON, how many URLs are waiting, being checked, and
+        finished, how many could not be checked, and how many items were
+        checked per second over the last minute.
+
+For example, to check two URLs from the command line:
+    curl -H "Content-Type: application/json" -d "{\"urls\":
+        [\"https://www.aamc.org/cim/\", \"https://www.aamc.org\"]}"
+        http://127.0.0.1:8790/jobs
+
+Instructions:
+(1) Edit this script if you want to change any of the settings between
+    the long lines of hashes. They are all optional and can be left as
+    they are.
+
+(2) Run the program, and leave it running while you use it. Press Ctrl+C
+    to stop it."""
+
+# Import libraries.
+import collections
+import concurrent.futures
+import functools
+import heapq
+import http.server
+import json
+import multiprocessing
+import signal
+import threading
+import time
+
+import requests
+
+from cim_core import (check_matches, content_kind, find_matches_in_bytes,
+                      find_matches_in_file, get_title, get_title_from_bytes,
+                      page_encoding, record_matches, skip_reason, website)
+from cim_pdf import find_matches_in_pdf
+
+########################################################################
+# Specify variables.
+
+# Optional: Specify the port to answer requests on. Change it if another
+    # program on this computer already uses this one.
+port = 8790
+
+# Optional: Specify the most URLs to check at the same time.
+max_concurrent_requests = 10
+
+# Optional: Specify how many separate processes to use for checking the
+    # pages for matches, so that large pages can be checked on several
+    # processor cores while other pages are still downloading. Set this
+    # to 0 to check them in the same process as the downloads.
+parse_workers = 2
+
+# Optional: Specify the shortest pause, in seconds, between URLs from the
+    # same website, to avoid the program being flagged as a bot.
+host_delay = 5
+
+# Optional: Specify how many seconds to wait for a page to respond
+    # before giving up on it.
+request_timeout = 30
+
+# Optional: Specify the largest file, in bytes, to download. Larger files
+    # are skipped. Set this to 0 for no limit.
+largest_file_bytes = 50000000
+
+# Optional: Specify the most pages of each PDF to check, and how many
+    # seconds to spend reading each PDF. Set either to 0 for no limit.
+pdf_page_limit = 200
+pdf_seconds = 60
+########################################################################
+
+# Create a session so that connections to the same website are reused
+    # rather than opened again for every URL, across all requests.
+session = requests.Session()
+adapter = requests.adapters.HTTPAdapter(
+    pool_maxsize = max(max_concurrent_requests, 10))
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+"""
+This class keeps the numbers that /metrics shows. Several threads update
+    it at the same time, so each change is made while holding a lock."""
+class ServiceStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.jobs = 0
+        self.running_jobs = 0
+        self.waiting = 0
+        self.in_progress = 0
+        self.finished = 0
+        self.errors = 0
+        # Keep the time each item finished in the last minute.
+        self.recent = collections.deque()
+
+    def start_job(self, items):
+        with self.lock:
+            self.jobs += 1
+            self.running_jobs += 1
+            self.waiting += items
+
+    def end_job(self, unstarted):
+        with self.lock:
+            self.running_jobs -= 1
+            self.waiting -= unstarted
+
+    def start_item(self):
+        with self.lock:
+            self.waiting -= 1
+            self.in_progress += 1
+
+    def end_item(self, row):
+        with self.lock:
+            self.in_progress -= 1
+            self.finished += 1
+            if "Error" in row:
+                self.errors += 1
+            self.recent.append(time.monotonic())
+
+    def report(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and self.recent[0] < now - 60:
+                self.recent.popleft()
+            uptime = now - self.started
+            return {"Uptime Seconds": round(uptime),
+                    "Jobs": self.jobs,
+                    "Jobs Running": self.running_jobs,
+                    "Items Waiting": self.waiting,
+                    "Items In Progress": self.in_progress,
+                    "Items Finished": self.finished,
+                    "Items With Errors": self.errors,
+                    "Items per Second": round(
+                        len(self.recent) / min(60, max(uptime, 1)), 2)}
+
+stats = ServiceStats()
+
+# Keep track of whether the program is stopping, so that pages waiting for
+    # their turn are not requested.
+shutting_down = threading.Event()
+
+# Limit how many PDFs are read at the same time, since each one is read
+    # in a process of its own.
+pdf_slots = threading.BoundedSemaphore(max(parse_workers, 1))
+
+"""
+This class decides when each URL is checked, across all jobs, like
+    schedule_pages in cim-scraper.py. Only one page from each website is
+    checked at a time, and the next one is started host_delay seconds
+    after it finishes. URLs from a website that is waiting for its turn
+    do not hold up the download threads, so URLs from other websites are
+    checked in the meantime. It runs in a thread of its own, which starts
+    each URL in the download threads when its website's turn comes."""
+class UrlSchedule:
+    def __init__(self):
+        self.condition = threading.Condition()
+        # Keep the URLs waiting for each website, each with the future that
+            # receives its results.
+        self.queues = {}
+        # Keep the websites that have URLs waiting and are not being
+            # checked in a heap, sorted by the earliest time their next URL
+            # can be started. The number keeps websites that are ready at
+            # the same time in the order they were added.
+        self.ready = []
+        self.added = 0
+        # Keep the websites with a URL being checked, and the earliest time
+            # the next URL from each website can be started, once one has
+            # been checked.
+        self.busy = set()
+        self.turns = {}
+
+    # Add a URL, returning a future for its results.
+    def add(self, url):
+        future = concurrent.futures.Future()
+        site = website(url)
+        with self.condition:
+            queue = self.queues.setdefault(site, collections.deque())
+            queue.append((url, future))
+            # A website that already had URLs waiting, or has one being
+                # checked, is already scheduled.
+            if len(queue) == 1 and site not in self.busy:
+                self.schedule(site, self.turns.get(site, 0))
+        return future
+
+    def schedule(self, site, start):
+        heapq.heappush(self.ready, (start, self.added, site))
+        self.added += 1
+        self.condition.notify()
+
+    # Start the URLs whose websites' turns have come, until the program
+        # stops.
+    def run(self):
+        with self.condition:
+            while not shutting_down.is_set():
+                if not self.ready:
+                    self.condition.wait()
+                    continue
+                wait = self.ready[0][0] - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                start, added, site = heapq.heappop(self.ready)
+                url, future = self.queues[site].popleft()
+                # Skip a URL whose job was stopped, going straight on to the
+                    # website's next URL.
+                if not future.set_running_or_notify_cancel():
+                    self.finish(site, start)
+                    continue
+                self.busy.add(site)
+                task = executor.submit(check_url, url)
+                task.add_done_callback(
+                    functools.partial(self.finished, url, future, site))
+            # Stop the URLs that are still waiting for their turn.
+            for queue in self.queues.values():
+                for url, future in queue:
+                    future.cancel()
+
+    # Pass on the results of a URL and schedule its website's next URL.
+    def finished(self, url, future, site, task):
+        if task.cancelled():
+            future.set_result(stopped_row(url))
+        else:
+            future.set_result(task.result())
+        with self.condition:
+            self.busy.discard(site)
+            self.finish(site, time.monotonic() + host_delay)
+
+    # Let the website's next URL start at start, or forget the website if
+        # it has no more URLs waiting.
+    def finish(self, site, start):
+        self.turns[site] = start
+        if self.queues[site]:
+            self.schedule(site, start)
+        else:
+            del self.queues[site]
+
+    # Wake the thread, so that it notices that the program is stopping.
+    def stop(self):
+        with self.condition:
+            self.condition.notify_all()
+
+url_schedule = UrlSchedule()
+
+"""
+This function identifies the title of a document and checks it for
+    matches. The document can be text, or bytes in encoding. It returns
+    the title and a dictionary with the results. It only uses what it is
+    given, so it can run in a separate process."""
+def check_document(data, encoding = None):
+    results = {}
+    if encoding is None:
+        title = get_title(data)
+        check_matches(data, results)
+    else:
+        title = get_title_from_bytes(data, encoding)
+        record_matches(find_matches_in_bytes(data, encoding), results)
+    return title, results
+
+"""
+This function checks a document in a parse worker if there are any, or
+    otherwise in the thread that calls it."""
+def check_in_pool(data, encoding = None):
+    if parse_pool is None:
+        return check_document(data, encoding)
+    return parse_pool.submit(check_document, data, encoding).result()
+
+"""
+This function checks a PDF, which can be bytes or the path of a file, and
+    adds the title, the results, and how many pages were checked to
+    row."""
+def check_pdf(source, row):
+    with pdf_slots:
+        title, matches, note, finished = find_matches_in_pdf(
+            source, pdf_page_limit, pdf_seconds)
+    row["Scraped Title"] = title
+    row["Content Status"] = "Checked (" + note + ")"
+    record_matches(matches, row)
+
+"""
+This function downloads a page and checks it, returning a dictionary with
+    the same fields as a row of the output of cim-scraper.py. Pages that
+    are not webpages, text, or PDFs, and pages that are too large, are
+    skipped, and "Content Status" says why."""
+def check_url(url):
+    stats.start_item()
+    row = {"URL": url, "Scraped Title": "N/A"}
+    try:
+        response = session.get(url, stream = True, timeout = request_timeout)
+        with response:
+            row["Scrape Response"] = str(response)
+            reason = skip_reason(response.headers, largest_file_bytes)
+            if reason is not None:
+                row["Content Status"] = reason
+            elif content_kind(response.headers) == "application/pdf":
+                check_pdf(response.content, row)
+            else:
+                encoding = page_encoding(response.encoding, response.content)
+                data = response.text if encoding is None else response.content
+                title, results = check_in_pool(data, encoding)
+                row["Scraped Title"] = title
+                row["Content Status"] = "Checked"
+                row.update(results)
+    # Catch only errors, so that one page that cannot be checked does not
+        # stop the rest of the job.
+    except Exception as error:
+        row["Error"] = type(error).__name__ + ": " + str(error)
+    stats.end_item(row)
+    return row
+
+"""
+This function returns the dictionary for a URL that was not checked
+    because the program stopped before its turn."""
+def stopped_row(url):
+    return {"URL": url, "Scraped Title": "N/A",
+            "Content Status": "Skipped: stopped before its turn"}
+
+"""
+This function checks a file on this computer, returning a dictionary like
+    check_url. PDFs are read a page at a time, and other files are
+    checked as UTF-8 text without reading all of them into memory at
+    once."""
+def check_path(path):
+    stats.start_item()
+    row = {"File": path, "Scraped Title": "N/A"}
+    try:
+        if path.lower().endswith(".pdf"):
+            check_pdf(path, row)
+        else:
+            # Look for the title only near the beginning of the file.
+            with open(path, "rb") as file:
+                row["Scraped Title"] = get_title_from_bytes(
+                    file.read(1000000))
+            record_matches(find_matches_in_file(path), row)
+            row["Content Status"] = "Checked"
+    except Exception as error:
+        row["Error"] = type(error).__name__ + ": " + str(error)
+    stats.end_item(row)
+    return row
+
+"""
+This function checks a text, returning a dictionary like check_url."""
+def check_text(text):
+    stats.start_item()
+    row = {"Scraped Title": "N/A"}
+    try:
+        title, results = check_in_pool(text)
+        row["Scraped Title"] = title
+        row.update(results)
+    except Exception as error:
+        row["Error"] = type(error).__name__ + ": " + str(error)
+    finally:
+        stats.end_item(row)
+    return row
+
+"""
+This function checks the items in a job, which is a dictionary read from
+    the body of a request, and yields a dictionary for each item as soon
+    as it is finished, with its place in the job under "Item". If the job
+    is not in one of the forms /jobs accepts, it raises ValueError before
+    checking anything. The error's message has no period at the end,
+    since send_error adds one."""
+def run_job(job):
+    if not isinstance(job, dict):
+        raise ValueError("The job needs to be a JSON object")
+    if isinstance(job.get("urls"), list) and all(
+            isinstance(url, str) for url in job["urls"]):
+        items = [(check_url, url) for url in job["urls"]]
+    elif isinstance(job.get("text"), str):
+        items = [(check_text, job["text"])]
+    elif isinstance(job.get("path"), str):
+        items = [(check_path, job["path"])]
+    else:
+        raise ValueError('The job needs "urls" (a list of URLs), "text", '
+                         'or "path"')
+    return check_items(items)
+
+"""
+This function checks the items in a list of pairs of a function and what
+    to check with it, scheduling URLs with url_schedule, and yields a
+    dictionary for each item as soon as it is finished."""
+def check_items(items):
+    stats.start_job(len(items))
+    futures = {}
+    try:
+        for number, (function, item) in enumerate(items):
+            if function is check_url:
+                futures[url_schedule.add(item)] = number, item
+            else:
+                yield {"Item": number, **function(item)}
+        for future in concurrent.futures.as_completed(futures):
+            number, url = futures[future]
+            # A URL is only cancelled before it starts, when the program is
+                # stopping.
+            if future.cancelled():
+                row = stopped_row(url)
+            else:
+                row = future.result()
+            yield {"Item": number, **row}
+    finally:
+        # If the program that sent the job stops listening, do not check
+            # the URLs that have not been started yet.
+        unstarted = sum(1 for future in futures if future.cancel())
+        stats.end_job(unstarted)
+
+"""
+This class answers the requests described at the beginning of this
+    script."""
+class ServiceHandler(http.server.BaseHTTPRequestHandler):
+    # Answer only requests addressed to this computer by its own name. A
+        # webpage can send requests to the program from the browser, but
+        # only under the name of another website, and it cannot send JSON
+        # to another website without the browser asking the program for
+        # permission first, which the program never gives.
+    def addressed_here(self):
+        host = self.headers.get("Host", "").lower()
+        if host not in ("127.0.0.1:" + str(port), "localhost:" + str(port)):
+            self.send_error(403, "Use http://127.0.0.1:" + str(port))
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.addressed_here():
+            return
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = json.dumps(stats.report(), indent = 4).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.addressed_here():
+            return
+        if self.path != "/jobs":
+            self.send_error(404)
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.send_error(415, "The job needs to be sent as "
+                            "application/json")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            results = run_job(json.loads(self.rfile.read(length)))
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+        # Send each result as soon as it is ready. The response ends when
+            # the connection is closed, so it needs no length.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for row in results:
+                self.wfile.write(json.dumps(row).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            results.close()
+
+    # Keep the program from printing a line for every request.
+    def log_message(self, format, *args):
+        pass
+
+"""
+This function does nothing. Giving it to each parse worker when the
+    program starts makes the workers start right away rather than when
+    the first page arrives."""
+def warm_up(number):
+    return number
+
+"""
+This function runs in each parse worker when it starts. Pressing Ctrl+C
+    interrupts the workers too, so they ignore it and are stopped by the
+    program instead."""
+def ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+# The download threads and parse workers are started in main, and shared
+    # by every request.
+executor = None
+parse_pool = None
+
+"""
+This function runs the program."""
+def main():
+    global executor, parse_pool
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers = max_concurrent_requests)
+    schedule_thread = threading.Thread(target = url_schedule.run)
+    schedule_thread.start()
+    if parse_workers > 0:
+        # Start the workers from scratch rather than as copies of the
+            # program, like the processes that read PDFs.
+        parse_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers = parse_workers, initializer = ignore_interrupts,
+            mp_context = multiprocessing.get_context("spawn"))
+        list(parse_pool.map(warm_up, range(parse_workers)))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port),
+                                             ServiceHandler)
+    server.daemon_threads = True
+    print("Answering requests at http://127.0.0.1:" + str(port) +
+          ". Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutting_down.set()
+        url_schedule.stop()
+        schedule_thread.join()
+        executor.shutdown(cancel_futures = True)
+        if parse_pool is not None:
+            parse_pool.shutdown()
+
+# Run the program only when this script is started directly, not when
+    # the parse workers load it to use its functions.
+if __name__ == "__main__":
+    main()
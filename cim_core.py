@@ -0,0 +1,833 @@
+#! python3
+# cim_core.py
+
+"""
+This module holds what cim-scraper.py, cim-files.py, cim-clipboard.py,
+    cim-clipboard_one-doc.py, and the other programs have in common: the
+    regular expressions that find possible references to AAMC's Careers
+    in Medicine program, the functions that check a text for them and
+    find its title, the functions that count and display the matches,
+    and the functions that the programs that download pages use to
+    decide which pages to check. It needs to be saved in the same folder
+    as those programs.
+
+To look for other terms, edit the regular expressions below, or list the
+    terms in a terms file (see terms_path below). The change will apply
+    to all four programs.
+
+This module only imports from the standard library when it is loaded.
+    Other libraries are imported the first time they are needed, so that
+    the programs start quickly."""
+
+# Import libraries.
+import codecs
+import collections
+import hashlib
+import html
+import html.parser
+import importlib.util
+import json
+import mmap
+import os
+import re
+import urllib.parse
+
+"""
+This function removes leading and trailing whitespace from an item, then
+    removes a leading and a trailing non-letter character, if there are
+    any, and returns the stripped item."""
+def strip_item(item):
+    # Remove leading and trailing whitespace.
+    i_1 = item.strip()
+    # If the first character is not a letter, remove it.
+    if i_1[0].isalpha() == False:
+        i_2 = i_1[1:]
+    else:
+        i_2 = i_1
+    # If the last character is not a letter, remove it.
+    if i_2[-1].isalpha() == False:
+        i_3 = i_2[:-1]
+    else:
+        i_3 = i_2
+    return i_3
+
+# Create regular expressions to identify more likely, possible, and
+    # unlikely true positives. Some groups are split into multiple
+    # regular expressions (a) to make it easier to deal with some
+    # matches requiring case sensitivity and others not, (b) to conform
+    # to PEP 8 guidelines regarding line length, and (c) to make the
+    # code easier to read. To look for many more terms, such as the names
+    # of other AAMC programs, use a terms file instead (see terms_path
+    # below).
+more_likely_re_1 = re.compile(r"Careers in Medicine|\WCiM\W")
+more_likely_re_2 = re.compile(r"medcar{1,2}e{1,2}rs", re.IGNORECASE)
+possible_re = re.compile(
+    r"Careers In Medicine|\Wcim\W|\WCIM\W|CAREERS IN MEDICINE")
+unlikely_re_1 = re.compile(r"[cC]areers in medicine")
+unlikely_re_2 = re.compile(r"career in", re.IGNORECASE)
+
+# List the regular expressions along with the type of match each one
+    # identifies. If you add a regular expression above, add it here
+    # too.
+tiered_res = [("More Likely", more_likely_re_1),
+              ("More Likely", more_likely_re_2),
+              ("Possible", possible_re),
+              ("Unlikely", unlikely_re_1),
+              ("Unlikely", unlikely_re_2)]
+
+# List the characters that a match can start with. Every regular
+    # expression above starts with a non-word character (\W), "c", "C",
+    # "m", or "M". Looking for matches only where one of these characters
+    # appears makes checking a long text much faster. If you change the
+    # regular expressions so that a match can start with another
+    # character, add it here.
+first_chars = r"\WcCmM"
+
+# Specify the length of the longest text any of the regular expressions
+    # above can match. When a page is checked a chunk at a time, this
+    # much text from the end of each chunk is kept and checked again with
+    # the next chunk, so that matches split between chunks are still
+    # found. If you change the regular expressions so that they can match
+    # longer text, increase this number.
+longest_match = 40
+
+# List the types of matches, in the order they are displayed. Every
+    # regular expression needs to identify one of these types.
+tiers = ["More Likely", "Possible", "Unlikely"]
+
+# Specify the terms file. If this file exists, the regular expressions,
+    # first characters, and longest match are loaded from it instead of
+    # being taken from above. See cim-terms_example.json for what the file
+    # looks like. The first time the file is loaded after it changes, the
+    # regular expressions built from it are saved in a cache file next to
+    # it, so that they do not need to be built again every time a program
+    # starts.
+terms_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "cim-terms.json")
+
+"""
+This function turns a list of terms into one regular expression shaped
+    like a tree, in which terms that start the same way share the same
+    branch. Checking a position in a text then only takes as many steps
+    as the longest term has characters, no matter how many terms there
+    are, whereas a regular expression that lists every term separately
+    has to try each one in turn. At each position, it matches the longest
+    term that starts there."""
+def trie_pattern(terms):
+    # Build a tree of nested dictionaries, one level per character. An
+        # empty key marks the end of a term.
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return node_pattern(trie)
+
+"""
+This function turns one branch of the tree built by trie_pattern into a
+    regular expression."""
+def node_pattern(node):
+    branches = [re.escape(char) + node_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    if len(branches) == 1:
+        pattern = branches[0]
+    else:
+        pattern = "(?:" + "|".join(branches) + ")"
+    # If a term ends here, the rest of the branch is optional, but it is
+        # tried first so that longer terms win.
+    if "" in node:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+"""
+This function builds tiered_res, first_chars, and longest_match from the
+    entries in a terms file. Each entry has a "tier" and either a list of
+    "terms" or a "regex". It can also have "ignore_case" set to true, and
+    an entry with terms can have "whole_words" set to true to match only
+    terms that have a non-word character on each side, like "CiM" in
+    more_likely_re_1 above. It returns the patterns and flags rather
+    than compiled regular expressions, so that they can be saved in the
+    cache file."""
+def build_terms(config):
+    patterns = []
+    chars = set()
+    # If any entry is a regular expression, the characters its matches can
+        # start with need to be listed in the file's "first_chars".
+        # Otherwise, every position in a text has to be checked.
+    any_regex = False
+    longest = config.get("longest_match", 0)
+    for entry in config["tiers"]:
+        if entry["tier"] not in tiers:
+            raise ValueError(f"Unknown tier {entry['tier']!r} in "
+                             f"{terms_path}. Use one of {tiers}.")
+        flags = re.IGNORECASE if entry.get("ignore_case") else 0
+        if "terms" in entry:
+            terms = [term for term in entry["terms"] if term]
+            if not terms:
+                raise ValueError(f"An entry in {terms_path} has no terms.")
+            if flags:
+                terms = [term.lower() for term in terms]
+            pattern = trie_pattern(terms)
+            longest = max(longest, max(len(term) for term in terms) + 2)
+            if entry.get("whole_words"):
+                pattern = r"\W(?:" + pattern + r")\W"
+                chars.add(r"\W")
+            else:
+                for term in terms:
+                    chars.add(re.escape(term[0]))
+                    if flags:
+                        chars.add(re.escape(term[0].upper()))
+        else:
+            pattern = entry["regex"]
+            any_regex = True
+        patterns.append([entry["tier"], pattern, flags])
+    if any_regex:
+        if "first_chars" in config:
+            chars.add(config["first_chars"])
+        else:
+            chars = None
+    if chars is not None:
+        chars = "".join(sorted(chars))
+    return patterns, chars, max(longest, longest_match)
+
+"""
+This function loads a terms file, using the patterns saved in its cache
+    file if the terms file has not changed since they were saved. It
+    returns a list like tiered_res, the first characters, and the length
+    of the longest match."""
+def load_terms(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    cache_file = os.path.splitext(path)[0] + ".cache.json"
+    try:
+        with open(cache_file, encoding = "utf-8") as file:
+            cached = json.load(file)
+        if cached["Terms Hash"] != digest:
+            cached = None
+    except (OSError, ValueError, KeyError):
+        cached = None
+    if cached is None:
+        patterns, chars, longest = build_terms(
+            json.loads(data.decode("utf-8-sig")))
+        cached = {"Terms Hash": digest,
+                  "Patterns": patterns,
+                  "First Characters": chars,
+                  "Longest Match": longest}
+        # Write the cache file under a temporary name first, so that it is
+            # never left half-written. If it cannot be written, for example
+            # because the folder is read-only, carry on without it.
+        try:
+            with open(cache_file + ".tmp", "w", encoding = "utf-8") as file:
+                json.dump(cached, file)
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError:
+            pass
+    loaded_res = [(tier, re.compile(pattern, flags))
+                  for tier, pattern, flags in cached["Patterns"]]
+    return (loaded_res, cached["First Characters"], cached["Longest Match"])
+
+if os.path.exists(terms_path):
+    tiered_res, first_chars, longest_match = load_terms(terms_path)
+
+"""
+This function combines the regular expressions in a list like tiered_res
+    into one regular expression, so that a text only needs to be scanned
+    once instead of once per regular expression. At each position in
+    the text, the combined regular expression looks ahead with every one
+    of the original regular expressions and captures what each of them
+    matches there, in groups named re_0, re_1, and so on. It only stops
+    at positions where at least one of them matches. If first_chars is
+    None, it checks every position."""
+def combine_res(tiered_res, first_chars):
+    # Wrap each regular expression in its own flags, since the
+        # combined regular expression cannot have the flags of all of
+        # them at once.
+    patterns = []
+    for tier, regex in tiered_res:
+        flags = ""
+        if regex.flags & re.IGNORECASE:
+            flags += "i"
+        if regex.flags & re.MULTILINE:
+            flags += "m"
+        if regex.flags & re.DOTALL:
+            flags += "s"
+        if regex.flags & re.VERBOSE:
+            flags += "x"
+        if flags:
+            patterns.append("(?" + flags + ":" + regex.pattern + ")")
+        else:
+            patterns.append("(?:" + regex.pattern + ")")
+    # Skip quickly past positions where no match can start.
+    combined = "(?=" + "|".join(patterns) + ")"
+    if first_chars is not None:
+        combined = "(?=[" + first_chars + "])" + combined
+    # Capture what each regular expression matches at this position.
+    for i, pattern in enumerate(patterns):
+        combined += "(?=(?P<re_" + str(i) + ">" + pattern + "))?"
+    return re.compile(combined)
+
+combined_re = combine_res(tiered_res, first_chars)
+
+"""
+This class scans text with combined_re as it arrives, a chunk at a time,
+    and keeps a list of stripped matches for each type of match. It
+    gives the same results as running findall with each regular
+    expression in tiered_res separately over the whole text: a match for
+    one regular expression can overlap a match for another (for example,
+    the spaces around "CiM" in "CiM CIM" count toward both), but never
+    an earlier match for the same regular expression. Only the last
+    longest_match characters of the text are held back between chunks,
+    so a match that is split between two chunks is still found."""
+class MatchScanner:
+    def __init__(self):
+        self.matches = {tier: [] for tier in tiers}
+        # Keep track of where the last match for each regular expression
+            # ended, counting from the beginning of the whole text.
+        self.ends = [0] * len(tiered_res)
+        # Keep track of items that have already been stripped, so that
+            # each distinct item is only stripped once.
+        self.stripped = {}
+        # Keep the text that has not been checked yet, and where it
+            # starts in the whole text.
+        self.buffer = ""
+        self.offset = 0
+
+    def feed(self, text):
+        self.buffer += text
+        # Only check positions that are followed by enough text for any
+            # match starting there to be complete.
+        self.scan(len(self.buffer) - longest_match)
+
+    def close(self):
+        self.scan(len(self.buffer))
+        return self.matches
+
+    def scan(self, stop):
+        if stop <= 0:
+            return
+        for match in combined_re.finditer(self.buffer):
+            if match.start() >= stop:
+                break
+            start = self.offset + match.start()
+            for i, (tier, regex) in enumerate(tiered_res):
+                item = match.group("re_" + str(i))
+                if item is None or start < self.ends[i]:
+                    continue
+                self.ends[i] = start + len(item)
+                if item not in self.stripped:
+                    self.stripped[item] = strip_item(item)
+                self.matches[tier].append(self.stripped[item])
+        self.buffer = self.buffer[stop:]
+        self.offset += stop
+
+"""
+This function scans a text once with combined_re and returns a dictionary
+    with a list of stripped matches for each type of match."""
+def find_matches(text):
+    scanner = MatchScanner()
+    scanner.feed(text)
+    return scanner.close()
+
+# Create a version of combined_re that searches bytes instead of text, so
+    # that a document can be checked without decoding it first. In a
+    # bytes regular expression, \W matches every byte that is not an ASCII
+    # letter, digit, or underscore, including each byte of a character
+    # such as "\u00e9", and case-insensitive matching only applies to
+    # ASCII letters. scan_bytes double-checks any match that includes
+    # such a character with the original regular expression.
+combined_bytes_re = re.compile(combined_re.pattern.encode("utf-8"))
+
+# Specify how many bytes of a file to map into memory at a time when
+    # checking a file with find_matches_in_file. Larger windows are
+    # slightly faster but use more memory. This needs to be a multiple of
+    # mmap.ALLOCATIONGRANULARITY, which any multiple of 65536 is.
+window_bytes = 16 * 1024 * 1024
+
+"""
+This function returns how many bytes long a UTF-8 character is, judging
+    by its first byte, or 1 if the byte cannot start a character."""
+def character_length(byte):
+    if 0xC2 <= byte < 0xE0:
+        return 2
+    if 0xE0 <= byte < 0xF0:
+        return 3
+    if 0xF0 <= byte < 0xF5:
+        return 4
+    return 1
+
+"""
+This function moves the start and end of a match in a UTF-8 document
+    outward to the nearest character boundaries, in case the match starts
+    or ends partway through a character that takes more than one byte.
+    It returns the new start and end."""
+def widen_to_characters(data, start, end):
+    # Bytes from 0x80 through 0xBF continue a character that started
+        # earlier, up to three bytes earlier.
+    if 0x80 <= data[start] < 0xC0:
+        for lead in range(start - 1, max(start - 4, -1), -1):
+            if not 0x80 <= data[lead] < 0xC0:
+                if lead + character_length(data[lead]) > start:
+                    start = lead
+                break
+    last = end - 1
+    if data[last] >= 0x80:
+        # Find the first byte of the character the match ends in.
+        lead = last
+        while lead > max(last - 3, 0) and 0x80 <= data[lead] < 0xC0:
+            lead -= 1
+        # Include the rest of the character, as long as it is there.
+        stop = min(lead + character_length(data[lead]), len(data))
+        while end < stop and 0x80 <= data[end] < 0xC0:
+            end += 1
+    return start, end
+
+"""
+This function returns the name Python uses for an encoding if a document
+    in that encoding can be checked as bytes with combined_bytes_re, or
+    None if it needs to be decoded first. That works for UTF-8 and for
+    encodings with one byte for each character that use the same bytes as
+    ASCII for ASCII characters, such as ISO-8859-1 and Windows-1252. It
+    does not work for encodings such as UTF-16, in which even ASCII
+    characters take more than one byte, or Shift JIS and ISO-2022-JP, in
+    which bytes that look like ASCII letters can be part of another
+    character. It also does not work if the regular expressions have
+    characters outside ASCII in them, as a terms file may."""
+def bytes_encoding(encoding):
+    if not combined_re.pattern.isascii():
+        return None
+    try:
+        name = codecs.lookup(encoding).name
+        if name == "utf-8":
+            return name
+        ascii_bytes = bytes(range(128))
+        if ascii_bytes.decode(name) != ascii_bytes.decode("ascii"):
+            return None
+        if len(bytes(range(256)).decode(name, errors = "replace")) != 256:
+            return None
+        # Check that each character outside ASCII that the encoding has
+            # takes a single byte outside ASCII.
+        for character in "\u00e9\u20ac\u0416\u03b1\u65e5\ud55c":
+            try:
+                encoded = character.encode(name)
+            except UnicodeEncodeError:
+                continue
+            if len(encoded) != 1 or encoded.isascii():
+                return None
+        return name
+    # Some encodings cannot decode every ASCII byte, and some names are not
+        # text encodings at all.
+    except (LookupError, UnicodeError):
+        pass
+    return None
+
+"""
+This function checks the bytes of data from start up to stop with
+    combined_bytes_re and adds the stripped matches to matches, a
+    dictionary with a list for each type of match. data holds a document,
+    or part of one starting offset bytes into it, in an encoding that
+    bytes_encoding accepts. Like in MatchScanner, ends keeps track of
+    where the last match for each regular expression ended, and stripped
+    keeps the items that have already been checked and stripped, so that
+    a long document can be checked a part at a time."""
+def scan_bytes(data, start, stop, offset, encoding, matches, ends,
+               stripped):
+    for match in combined_bytes_re.finditer(data, start):
+        if match.start() >= stop:
+            break
+        for i, (tier, regex) in enumerate(tiered_res):
+            item = match.group("re_" + str(i))
+            if item is None:
+                continue
+            item_start = match.start()
+            item_end = item_start + len(item)
+            if encoding == "utf-8":
+                item_start, item_end = widen_to_characters(
+                    data, item_start, item_end)
+            if offset + item_start < ends[i]:
+                continue
+            item = data[item_start:item_end]
+            if item not in stripped:
+                text = item.decode(encoding, errors = "replace")
+                # Skip matches that only match as bytes, such as
+                    # "\u00e9CiM ", where the "\u00e9" is a letter rather
+                    # than a non-word character.
+                if item.isascii() or regex.fullmatch(text):
+                    stripped[item] = strip_item(text)
+                else:
+                    stripped[item] = None
+            if stripped[item] is None:
+                continue
+            ends[i] = offset + item_end
+            matches[tier].append(stripped[item])
+
+"""
+This function checks a document that is still in bytes, such as a
+    downloaded page, for all of the regular expressions without decoding
+    it. The encoding needs to be one that bytes_encoding accepts. Like
+    find_matches, it returns a dictionary with a list of stripped matches
+    for each type of match, and the results are the same as running
+    find_matches on the decoded text, except that case-insensitive
+    regular expressions only match ASCII letters."""
+def find_matches_in_bytes(data, encoding = "utf-8"):
+    matches = {tier: [] for tier in tiers}
+    scan_bytes(data, 0, len(data), 0, encoding, matches,
+               [0] * len(tiered_res), {})
+    return matches
+
+"""
+This function checks a UTF-8 text file for all of the regular expressions
+    without reading the whole file into memory or decoding it. It maps
+    the file into memory window_bytes at a time and scans each window with
+    scan_bytes. Like find_matches_in_bytes, it returns a dictionary with
+    a list of stripped matches for each type of match."""
+def find_matches_in_file(path):
+    matches = {tier: [] for tier in tiers}
+    # Keep track of where the last match for each regular expression
+        # ended, counting from the beginning of the file, and which items
+        # have already been checked and stripped.
+    ends = [0] * len(tiered_res)
+    stripped = {}
+    # Keep enough bytes on either side of each window for any match that
+        # starts in the window, plus a partial character at each end.
+    margin = 4 * longest_match
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        for window_start in range(0, size, window_bytes):
+            window_end = min(window_start + window_bytes, size)
+            # The mapping has to start at a multiple of the allocation
+                # granularity.
+            map_start = max(0, window_start - margin)
+            map_start -= map_start % mmap.ALLOCATIONGRANULARITY
+            map_end = min(window_end + margin, size)
+            with mmap.mmap(file.fileno(), map_end - map_start,
+                           access = mmap.ACCESS_READ,
+                           offset = map_start) as data:
+                scan_bytes(data, window_start - map_start,
+                           window_end - map_start, map_start, "utf-8",
+                           matches, ends, stripped)
+    return matches
+
+"""
+This function reads a string to find text that could indicate why that
+    page came up in the search results, notes whether that text is a
+    probable true positive, possible true positive, or probable false
+    positive with regard to referencing the AAMC program now called
+    Careers in Medicine. It counts the matches and lists them in a
+    dictionary."""
+def check_matches(text, dictionary):
+    # Check the text for all of the regular expressions at once.
+    record_matches(find_matches(text), dictionary)
+
+"""
+This function counts and lists the matches returned by find_matches or
+    MatchScanner in a dictionary."""
+def record_matches(matches, dictionary):
+    stripped_more_likelies = matches["More Likely"]
+    stripped_possibles = matches["Possible"]
+    stripped_unlikelies = matches["Unlikely"]
+
+    # Remove duplicates from each list.
+    more_likelies_set_list = sorted(set(stripped_more_likelies),
+                                    key = str.casefold)
+    possibles_set_list = sorted(set(stripped_possibles), key = str.casefold)
+    unlikelies_set_list = sorted(set(stripped_unlikelies), key = str.casefold)
+
+    # Add the lists to the dictionary.
+    dictionary["Number of More Likely Matches"] = len(stripped_more_likelies)
+    dictionary["More Likely Matches"] = "; ".join(more_likelies_set_list)
+    dictionary["Number of Possible Matches"] = len(stripped_possibles)
+    dictionary["Possible Matches"] = "; ".join(possibles_set_list)
+    dictionary["Number of Unlikely Matches"] = len(stripped_unlikelies)
+    dictionary["Unlikely Matches"] = "; ".join(unlikelies_set_list)
+
+# List the fields that cim-scraper.py and cim-files.py add to each row of
+    # their output CSV files.
+added_fields = ["Scraped Title",
+                "Scrape Response",
+                "Number of More Likely Matches",
+                "More Likely Matches",
+                "Number of Possible Matches",
+                "Possible Matches",
+                "Number of Unlikely Matches",
+                "Unlikely Matches"]
+
+# Create sample text with which to test the regular expressions.
+sample_text = ("AAMC has a program called called Careers in " +
+               "Medicine, which is abbreviated \"CiM.\" \"CiM\"" + 
+               "sometimes appears between parentheses (CiM). " +
+               "Sometimes the name is rendered with a capitalized " +
+               "\"I,\" as in \"Careers In Medicine\" (CIM [CIM]). " +
+               "Some texts may use all capitals, shouting, " +
+               "\"CAREERS IN MEDICINE\"! The program used to be " +
+               "called MEDcareers or MedCAREERS or medCAREERS or " +
+               "medCareers or MEDCAREERS, or maybe even medcareers. " +
+               "One of those iterations was official, but people " +
+               "don't always write it that way (similar to how " +
+               "people write \"American Association of Medical " +
+               "Colleges\" instead of \"Association of American " +
+               "Medical Colleges\"). I think I've even seen " +
+               "something like \"Medcarrers\" in a non-English " +
+               "language text. Also, some search engines try to be " +
+               "helpful by including near matches, such as \"career " +
+               "in medicine,\" or even \"career in academic " +
+               "medicine.\" To be fair, this kind of thing is " +
+               "generally helpful--it just so happens that this is " +
+               "one of the cases where the near match is almost " +
+               "certainly a false positive. Similarly, search engines" +
+               "tend to be case insensitive, which is usually " +
+               "helpful--with CiM, however, it leads to many false " +
+               "positives, as many people talk about careers in " +
+               "medicine without referring to the AAMC program.")
+
+# Create a regular expression for the start of a title tag, and a version
+    # that searches bytes.
+title_tag_re = re.compile(r"<title", re.IGNORECASE)
+title_tag_bytes_re = re.compile(rb"<title", re.IGNORECASE)
+
+"""
+This class reads an HTML document until the end of its first title
+    element and keeps the text of the title. Like web browsers, it treats
+    everything between <title> and </title> as text, even if it looks
+    like a tag, and it skips anything that looks like a title inside
+    comments, scripts, styles, and text areas."""
+class TitleParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.in_title = False
+        self.finished = False
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self.finished:
+            self.in_title = True
+            self.set_cdata_mode(tag)
+        elif tag in ("textarea", "xmp", "iframe", "noembed", "noframes"):
+            self.set_cdata_mode(tag)
+        # Nothing after a plaintext tag is HTML, so there can be no title.
+        elif tag == "plaintext":
+            self.finished = True
+
+    def handle_endtag(self, tag):
+        if self.in_title and tag == "title":
+            self.in_title = False
+            self.finished = True
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.parts.append(data)
+
+    # Read text a little at a time, stopping as soon as the title has
+        # ended, which for most pages is near the very beginning.
+    def feed_text(self, text):
+        for i in range(0, len(text), 4096):
+            if self.finished:
+                break
+            self.feed(text[i:i + 4096])
+
+    # Return the polished title, "N/A" if there was no title or nothing
+        # between the title tags, or "" if there were only spaces between
+        # them.
+    def title(self):
+        self.close()
+        # If the title never ended, it runs to the end of the document.
+        if self.in_title:
+            self.parts.append(self.rawdata)
+        if not self.parts:
+            return "N/A"
+        # Convert character references such as "&amp;" to the characters
+            # they stand for, and replace any null characters.
+        title = html.unescape("".join(self.parts))
+        title = title.replace("\x00", "\ufffd")
+        # Replace each run of spaces, tabs, and new line characters in the
+            # title with a single space, and remove leading and trailing
+            # spaces.
+        return " ".join(title.split())
+
+"""
+This function finds the title of an HTML document and polishes it up. It
+    returns "N/A" if the document has no title or nothing at all between
+    the title tags, and "" if there are only spaces between them, as
+    BeautifulSoup did."""
+def get_title(data):
+    # Skip documents that do not have a title tag at all.
+    if not title_tag_re.search(data):
+        return "N/A"
+    parser = TitleParser()
+    parser.feed_text(data)
+    return parser.title()
+
+"""
+This function finds the title of an HTML document that is still in bytes,
+    in an encoding that bytes_encoding accepts, like get_title. It only
+    decodes the document up to the end of the title, which for most
+    documents is near the very beginning."""
+def get_title_from_bytes(data, encoding = "utf-8"):
+    if not title_tag_bytes_re.search(data):
+        return "N/A"
+    decoder = codecs.getincrementaldecoder(encoding)(errors = "replace")
+    parser = TitleParser()
+    for i in range(0, len(data), 4096):
+        if parser.finished:
+            break
+        parser.feed(decoder.decode(data[i:i + 4096]))
+    else:
+        parser.feed(decoder.decode(b"", final = True))
+    return parser.title()
+
+# Check whether pypdf is installed, which is needed to check PDFs. It is
+    # only loaded by cim_pdf.py, in the processes that read them.
+pdf_support = importlib.util.find_spec("pypdf") is not None
+
+# List the kinds of content that the programs that download pages check,
+    # as they appear at the start of the Content-Type header. Any kind
+    # starting with "text/" is also checked, and PDFs are checked if
+    # pypdf is installed.
+checked_types = ["application/xhtml+xml", "application/xml",
+                 "application/rss+xml", "application/atom+xml",
+                 "application/json"]
+
+"""
+This function returns the kind of content in a response, from the start
+    of its Content-Type header, in lowercase, such as "text/html". It
+    returns "" if the response has no Content-Type header."""
+def content_kind(headers):
+    return headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+"""
+This function looks at the headers of a response, before the rest of it
+    is downloaded, and returns why the page should be skipped, or None if
+    it should be checked. A page is skipped if it is not a webpage, text,
+    or a PDF that can be checked, or if it is larger than largest_bytes,
+    unless largest_bytes is 0. PDFs can be checked if check_pdfs is True
+    and pypdf is installed. A response without a Content-Type header is
+    checked like a webpage, since most of them are webpages."""
+def skip_reason(headers, largest_bytes = 0, check_pdfs = True):
+    kind = content_kind(headers)
+    if kind == "application/pdf":
+        if not check_pdfs:
+            return "Skipped: PDF"
+        if not pdf_support:
+            return "Skipped: PDF (pypdf is not installed)"
+    elif kind and not kind.startswith("text/") and kind not in checked_types:
+        return "Skipped: not a webpage (" + kind + ")"
+    try:
+        size = int(headers.get("Content-Length", ""))
+    except ValueError:
+        size = 0
+    if largest_bytes and size > largest_bytes:
+        return "Skipped: too large (" + str(size) + " bytes)"
+    return None
+
+"""
+This function returns the encoding of a page if its bytes can be checked
+    without decoding them, or None if the page needs to be decoded first.
+    encoding is the encoding the website gave, or None if it gave none,
+    and data is the bytes of the page."""
+def page_encoding(encoding, data):
+    if encoding is not None:
+        return bytes_encoding(encoding)
+    # If the website does not say how the page is encoded, requests guesses
+        # by studying all of its bytes, which is slow for a large page. A
+        # page whose bytes are valid UTF-8 is almost certainly UTF-8, which
+        # is much quicker to find out.
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    return "utf-8"
+
+"""
+This function returns the scheme and website name of a URL, such as
+    "https://www.aamc.org". The programs that download pages pause
+    between pages from the same website."""
+def website(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme + "://" + parts.netloc.lower()
+
+# List the parts after a question mark in a URL that only track where a
+    # visitor came from, so that URLs that differ only in them are the
+    # same page. Any part starting with "utm_" is also a tracking code.
+tracking_parameters = {"_ga", "_gl", "dclid", "fbclid", "gclid", "gclsrc",
+                       "igshid", "mc_cid", "mc_eid", "msclkid", "yclid"}
+
+"""
+This function returns a canonical form of a URL, which is the same for
+    URLs that differ only in "http" versus "https", capital letters in the
+    website name, the usual port, a slash at the end, a part starting
+    with "#", the order of the parts after a question mark, or tracking
+    codes. The programs that download pages use it to tell whether two
+    URLs are the same page. It is only used to compare URLs; the pages
+    are still downloaded from the URLs as they are written."""
+def canonical_url(url):
+    parts = urllib.parse.urlsplit(url.strip())
+    # Treat "http" and "https" as the same.
+    scheme = parts.scheme.lower()
+    if scheme == "https":
+        scheme = "http"
+    # Leave out the port if it is the usual one.
+    host = parts.hostname or ""
+    if ":" in host:
+        host = "[" + host + "]"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port not in (80, 443):
+        host += ":" + str(port)
+    # Leave out tracking codes, and sort the rest of the parts after the
+        # question mark.
+    query = [(name, value) for name, value in
+             urllib.parse.parse_qsl(parts.query, keep_blank_values = True)
+             if name.lower() not in tracking_parameters and
+             not name.lower().startswith("utm_")]
+    return urllib.parse.urlunsplit((scheme, host, parts.path.rstrip("/"),
+                                    urllib.parse.urlencode(sorted(query)),
+                                    ""))
+
+"""
+This function counts how many times each distinct match appears in a
+    dictionary returned by find_matches. For each type of match, it
+    returns a list of dictionaries, each with a match and its count. The
+    lists are in alphabetical order, except that the more likely matches
+    are listed from most to least common."""
+def tally_matches(matches):
+    tallies = {}
+    for tier, items in matches.items():
+        counts = collections.Counter(items)
+        tallies[tier] = [{"Match": item, "Count": counts[item]}
+                         for item in sorted(counts, key = str.casefold)]
+    tallies["More Likely"].sort(key = lambda row: row["Count"],
+                                reverse = True)
+    return tallies
+
+"""
+This function displays the matches in a dictionary returned by
+    find_matches as three tables: more likely true positives, possible
+    true positives, and probable false positives."""
+def print_results(matches):
+    # Import tabulate here rather than when the module is loaded, since it
+        # is only needed once there are results to display.
+    from tabulate import tabulate
+
+    tallies = tally_matches(matches)
+    print("More Likely True Positives: " +
+          str(len(matches["More Likely"])).rjust(3))
+    if len(tallies["More Likely"]) > 0:
+        print(tabulate(tallies["More Likely"], headers = "keys",
+                       tablefmt = "psql", showindex = False))
+    print()
+    print("Possible True Positives: " +
+          str(len(matches["Possible"])).rjust(6))
+    if len(tallies["Possible"]) > 0:
+        print(tabulate(tallies["Possible"], headers = "keys",
+                       tablefmt = "psql", showindex = False))
+    print()
+    print("Probable FALSE Positives: " +
+          str(len(matches["Unlikely"])).rjust(5))
+    if len(tallies["Unlikely"]) > 0:
+        print(tabulate(tallies["Unlikely"], headers = "keys",
+                       tablefmt = "psql", showindex = False))
@@ -0,0 +1,131 @@
+#! python3
+# cim_pdf.py
+
+"""
+This module checks PDFs for the same text strings as the other programs.
+    It is used by cim-scraper.py for URLs that lead to PDFs, and by
+    cim-files.py and cim-clipboard_one-doc.py for PDF files. It needs the
+    third-party module pypdf, which reads PDFs on the computer itself
+    without sending them anywhere, and it needs to be saved in the same
+    folder as those programs.
+
+Each PDF is read in a separate process, a page at a time, and the text of
+    each page is checked as soon as it has been read, so the text of the
+    whole PDF never needs to be in memory at once. Some PDFs take a very
+    long time to read, so reading stops after a set number of pages or
+    seconds, and if a single page takes too long, the process is stopped
+    so that the program can go on to the next PDF."""
+
+# Import libraries.
+import io
+import logging
+import multiprocessing
+import time
+
+# pdf_support says whether pypdf is installed. pypdf is only needed when
+    # there are PDFs to check, so it is only loaded in the processes that
+    # read them.
+from cim_core import MatchScanner, pdf_support
+
+# Start each process from scratch rather than as a copy of the program,
+    # which is how it works on Windows anyway. Copying a program that is
+    # downloading pages in several threads at once can leave the copy
+    # stuck.
+context = multiprocessing.get_context("spawn")
+
+"""
+This exception means that a PDF could not be checked, either because it
+    could not be read or because reading a page took too long."""
+class PdfError(Exception):
+    pass
+
+"""
+This function reads a PDF a page at a time and checks the text of each
+    page for matches, stopping after max_pages pages or once seconds have
+    passed, if either is not 0. The PDF can be bytes or the path of a
+    file. It runs in a separate process and sends its results back over
+    a connection: either the title, the matches, the number of pages
+    checked, the number of pages in the PDF, and whether it ran out of
+    time, or an error message."""
+def read_pdf(source, max_pages, seconds, connection):
+    try:
+        import pypdf
+        # Keep pypdf's warnings about damaged PDFs out of the program's
+            # output. A PDF that cannot be read is reported anyway.
+        logging.getLogger("pypdf").setLevel(logging.ERROR)
+        start = time.monotonic()
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        reader = pypdf.PdfReader(source)
+        title = "N/A"
+        if reader.metadata is not None and reader.metadata.title:
+            title = " ".join(str(reader.metadata.title).split()) or "N/A"
+        scanner = MatchScanner()
+        page_count = len(reader.pages)
+        checked = 0
+        out_of_time = False
+        for page in reader.pages:
+            if max_pages and checked >= max_pages:
+                break
+            if seconds and time.monotonic() - start > seconds:
+                out_of_time = True
+                break
+            # Put a new line between pages, so that a match cannot run from
+                # the end of one page into the next.
+            scanner.feed((page.extract_text() or "") + "\n")
+            checked += 1
+        connection.send((title, scanner.close(), checked, page_count,
+                         out_of_time))
+    except Exception as error:
+        connection.send(f"{type(error).__name__}: {error}")
+    finally:
+        connection.close()
+
+"""
+This function checks a PDF, which can be bytes or the path of a file, in
+    a separate process. It returns the title from the PDF's properties
+    (or "N/A" if it has none), a dictionary with a list of stripped
+    matches for each type of match like find_matches in cim_core.py, a
+    short note on how many pages were checked, and whether it finished
+    checking them rather than running out of time. If max_pages is not 0,
+    only that many pages are checked. If seconds is not 0, no more pages
+    are started after that many seconds, and if the process is still
+    going after twice that many seconds plus 10 more (to allow for
+    starting it), it is stopped and PdfError is raised. PdfError is also
+    raised if the PDF cannot be read or pypdf is not installed."""
+def find_matches_in_pdf(source, max_pages = 0, seconds = 0):
+    if not pdf_support:
+        raise PdfError("pypdf is not installed")
+    receiver, sender = context.Pipe(duplex = False)
+    process = context.Process(target = read_pdf,
+                              args = (source, max_pages, seconds, sender),
+                              daemon = True)
+    process.start()
+    # Only the process needs this end of the connection. Closing it here
+        # means that the connection ends if the process stops without
+        # sending anything.
+    sender.close()
+    try:
+        time_limit = 2 * seconds + 10 if seconds else None
+        if not receiver.poll(time_limit):
+            process.terminate()
+            raise PdfError(f"Reading took longer than {time_limit} seconds")
+        try:
+            result = receiver.recv()
+        except EOFError:
+            raise PdfError("The process reading the PDF stopped "
+                           "unexpectedly") from None
+    finally:
+        receiver.close()
+        process.join()
+    if isinstance(result, str):
+        raise PdfError(result)
+    title, matches, checked, page_count, out_of_time = result
+    pages = "page" if page_count == 1 else "pages"
+    if checked == page_count:
+        note = f"PDF, {page_count} {pages}"
+    else:
+        note = f"PDF, first {checked} of {page_count} {pages}"
+        if out_of_time:
+            note += " before running out of time"
+    return title, matches, note, not out_of_time
@@ -0,0 +1,215 @@
+#! python3
+# cim_store.py
+
+"""
+This module keeps the results of cim-scraper.py in a SQLite database, so
+    that results can be looked up across runs--for example, to list the
+    pages with more likely matches in the most recent run, or to see how
+    the matches on a page changed from one run to the next. It is used by
+    cim-scraper.py when use_database is True, and by cim-results.py, which
+    looks up results in the database and exports them. It needs to be
+    saved in the same folder as those programs.
+
+The database has two tables. The runs table has a row for each run of
+    cim-scraper.py, with when it started and finished and which files it
+    read and wrote. The results table has a row for each row of the source
+    CSV file in each run. Its rows are found by run and row number, so
+    that a resumed run that writes a row again replaces it rather than
+    adding a second copy, and by URL, so that the results for one page
+    can be looked up across runs."""
+
+# Import libraries.
+import csv
+import datetime
+import json
+import sqlite3
+import time
+
+# List the columns of the results table that hold the fields cim-scraper.py
+    # adds, along with the field each one comes from. Every field of the
+    # row, including the fields of the source CSV file, is also kept
+    # together in the fields column, so that the row can be exported
+    # exactly as it was written.
+result_columns = [("title", "Scraped Title"),
+                  ("response", "Scrape Response"),
+                  ("more_likely_count", "Number of More Likely Matches"),
+                  ("more_likely", "More Likely Matches"),
+                  ("possible_count", "Number of Possible Matches"),
+                  ("possible", "Possible Matches"),
+                  ("unlikely_count", "Number of Unlikely Matches"),
+                  ("unlikely", "Unlikely Matches")]
+
+# Create the tables and the indexes that make the usual lookups fast, if
+    # they do not exist yet.
+schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    finished TEXT,
+    source_csv TEXT NOT NULL,
+    output_csv TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    url TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    checked TEXT NOT NULL,
+    title TEXT,
+    response TEXT,
+    more_likely_count INTEGER,
+    more_likely TEXT,
+    possible_count INTEGER,
+    possible TEXT,
+    unlikely_count INTEGER,
+    unlikely TEXT,
+    fields TEXT NOT NULL,
+    PRIMARY KEY (run_id, row_number));
+CREATE INDEX IF NOT EXISTS results_by_url ON results (url, run_id);
+CREATE INDEX IF NOT EXISTS results_by_more_likely
+    ON results (run_id, more_likely_count);
+"""
+
+"""
+This function returns the current time as text, to the second."""
+def now():
+    return datetime.datetime.now().isoformat(sep = " ", timespec = "seconds")
+
+"""
+This function opens the database, creating it if it does not exist yet,
+    and returns the connection."""
+def open_database(path):
+    connection = sqlite3.connect(path)
+    # Let other programs read the database while a run is writing to it,
+        # and write to the disk less often. A write that is lost in a power
+        # failure is at worst one batch of rows.
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(schema)
+    return connection
+
+"""
+This class adds the rows of one run of cim-scraper.py to the database. It
+    saves the rows in batches, each in a single transaction, since saving
+    each row in a transaction of its own would be much slower. A batch is
+    saved when it has batch_size rows, when batch_seconds have passed
+    since the last one, and when the store is closed, which happens at the
+    end of a "with" block even if the run is interrupted."""
+class ResultStore:
+    def __init__(self, path, source_csv, output_csv, batch_size = 500,
+                 batch_seconds = 5):
+        self.connection = open_database(path)
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.batch = []
+        self.last_saved = time.monotonic()
+        # Continue the run that writes to the same output CSV file, if the
+            # run is being resumed, or start a new one.
+        found = self.connection.execute(
+            "SELECT run_id FROM runs WHERE output_csv = ?",
+            (output_csv,)).fetchone()
+        if found is not None:
+            self.run_id = found[0]
+        else:
+            with self.connection:
+                self.run_id = self.connection.execute(
+                    "INSERT INTO runs (started, source_csv, output_csv) "
+                    "VALUES (?, ?, ?)",
+                    (now(), source_csv, output_csv)).lastrowid
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def add(self, row_number, page):
+        # Save every field as text, the way it is written to the CSV file.
+        fields = {name: "" if value is None else str(value)
+                  for name, value in page.items()}
+        self.batch.append(
+            [self.run_id, fields["URL"], row_number, now()] +
+            [fields.get(field) or None for column, field in result_columns] +
+            [json.dumps(fields)])
+        if (len(self.batch) >= self.batch_size or
+                time.monotonic() - self.last_saved >= self.batch_seconds):
+            self.save()
+
+    def save(self):
+        if self.batch:
+            columns = (["run_id", "url", "row_number", "checked"] +
+                       [column for column, field in result_columns] +
+                       ["fields"])
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO results (" + ", ".join(columns) + ") " +
+                    "VALUES (" + ", ".join("?" * len(columns)) + ") " +
+                    "ON CONFLICT (run_id, row_number) DO UPDATE SET " +
+                    ", ".join(column + " = excluded." + column
+                              for column in columns[3:]),
+                    self.batch)
+            self.batch = []
+        self.last_saved = time.monotonic()
+
+    # Note that the run is finished.
+    def finish(self):
+        self.save()
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET finished = ? WHERE run_id = ?",
+                (now(), self.run_id))
+
+    def close(self):
+        self.save()
+        self.connection.close()
+
+"""
+This function returns the run ID of the most recent run, or None if there
+    are no runs."""
+def last_run(connection):
+    return connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+"""
+This function returns a list of the runs, each as a tuple of the run ID,
+    when it started and finished, the source CSV file, the output CSV
+    file, and how many rows it has written."""
+def list_runs(connection):
+    return connection.execute(
+        "SELECT runs.run_id, started, finished, source_csv, output_csv, "
+        "(SELECT COUNT(*) FROM results WHERE results.run_id = runs.run_id) "
+        "FROM runs ORDER BY runs.run_id").fetchall()
+
+"""
+This function returns the URLs with at least one more likely match in a
+    run, each as a tuple of the URL, the title, the number of more likely
+    matches, and the matches, with the most matches first. A URL that
+    appears in more than one row is listed once."""
+def more_likely_pages(connection, run_id):
+    return connection.execute(
+        "SELECT url, title, more_likely_count, more_likely FROM results "
+        "WHERE run_id = ? AND more_likely_count > 0 GROUP BY url "
+        "ORDER BY more_likely_count DESC, url", (run_id,)).fetchall()
+
+"""
+This function returns the result for a URL in every run that checked it,
+    each as a tuple of the run ID, when it was checked, the response, and
+    the numbers of more likely, possible, and unlikely matches."""
+def url_history(connection, url):
+    return connection.execute(
+        "SELECT run_id, checked, response, more_likely_count, "
+        "possible_count, unlikely_count FROM results WHERE url = ? "
+        "GROUP BY run_id ORDER BY run_id", (url,)).fetchall()
+
+"""
+This function writes the rows of a run to a CSV file with the same
+    columns as the output CSV file of cim-scraper.py, in the order of the
+    source CSV file. It returns how many rows it wrote."""
+def export_run(connection, run_id, filename):
+    rows = [json.loads(fields) for (fields,) in connection.execute(
+        "SELECT fields FROM results WHERE run_id = ? ORDER BY row_number",
+        (run_id,))]
+    # Keep the columns in the order they first appear.
+    field_names = list(dict.fromkeys(name for row in rows for name in row))
+    with open(filename, "w", encoding = "utf-8-sig", newline = "") as file:
+        writer = csv.DictWriter(file, fieldnames = field_names)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
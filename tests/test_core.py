@@ -0,0 +1,186 @@
+#! python3
+# test_core.py
+
+"""
+These tests check that the single scan in cim_core.py finds the same
+    matches as the five separate findall scans that check_matches used to
+    run, one for each regular expression in tiered_res. Run them from the
+    main folder with "python -m unittest" or "python -m pytest"."""
+
+# Import libraries.
+import os
+import random
+import sys
+import unittest
+
+# Make cim_core.py importable from the main folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import cim_core
+
+# List texts in which matches overlap, touch, or sit at the very beginning
+    # or end of the text.
+edge_texts = ["",
+              "CiM",
+              " CiM ",
+              "CiM is at the start",
+              "at the end is CiM",
+              "at the end is (CiM)",
+              " CiM CIM ",
+              " CiM CiM CiM ",
+              "(CiM)(CiM)(CIM)(cim)",
+              " CIM CIM CIM ",
+              "\"CiM.\"\"CiM\"",
+              "caféCiMé é CiM é",
+              "medcarreers medcareerrs MEDCAREERS medcarrerrs medcers",
+              "medcareersmedcareers",
+              "Careers in Medicine careers in medicine",
+              "Careers In Medicine CAREERS IN MEDICINE",
+              "career incareer in CAREER IN Career In",
+              "career in medicine, career in academic medicine",
+              "Careers in Medicine (CiM) and Careers In Medicine (CIM)",
+              "Careers in MedicineCareers in Medicine",
+              "\nCiM\n\tCIM\t(cim)\n"]
+
+# List pieces to build random texts from, so that many different kinds of
+    # overlapping and touching matches are tried.
+pieces = ["CiM", "CIM", "cim", "Cim", " ", "(", ")", ".", "\"", "\n",
+          "é", "Careers", "careers", "CAREERS", "Career", "career",
+          " in ", " In ", " IN ", "in", "Medicine", "medicine",
+          "MEDICINE", "med", "MED", "car", "r", "e", "ers", "s"]
+
+"""
+This function checks a text the way check_matches used to: it runs
+    findall with each regular expression in tiered_res separately, strips
+    each item, and adds the items to the list for the regular expression's
+    type of match. It returns the lists for each regular expression
+    separately as well as the lists for each type of match."""
+def findall_matches(text):
+    lists = []
+    matches = {tier: [] for tier in cim_core.tiers}
+    for tier, regex in cim_core.tiered_res:
+        items = [cim_core.strip_item(match.group())
+                 for match in regex.finditer(text)]
+        lists.append(items)
+        matches[tier] += items
+    return lists, matches
+
+"""
+This function returns True if all the items in part appear in whole in
+    the same order, with or without other items between them."""
+def in_order(part, whole):
+    rest = iter(whole)
+    return all(item in rest for item in part)
+
+"""
+This function builds a random text out of the pieces listed above."""
+def random_text(generator):
+    return "".join(generator.choice(pieces)
+                   for i in range(generator.randint(0, 60)))
+
+class FindMatchesTest(unittest.TestCase):
+    # Compare find_matches with the findall baseline for one text.
+    def check_text(self, text):
+        lists, expected = findall_matches(text)
+        matches = cim_core.find_matches(text)
+        self.assertEqual(list(matches), cim_core.tiers)
+        for tier in cim_core.tiers:
+            # The counts and the matches must be the same. The order
+                # can differ only because matches for two regular
+                # expressions of the same type are listed in the order
+                # they appear in the text, not one regular expression
+                # after the other.
+            self.assertEqual(len(matches[tier]), len(expected[tier]),
+                             (text, tier))
+            self.assertEqual(sorted(matches[tier]), sorted(expected[tier]),
+                             (text, tier))
+        # The matches for each regular expression must be in the same
+            # order as findall returns them.
+        for (tier, regex), items in zip(cim_core.tiered_res, lists):
+            self.assertTrue(in_order(items, matches[tier]),
+                            (text, regex.pattern))
+        # The tables of matches must be the same, row for row.
+        self.assertEqual(cim_core.tally_matches(matches),
+                         cim_core.tally_matches(expected), text)
+
+    def test_sample_text(self):
+        self.check_text(cim_core.sample_text)
+
+    # The sample text should have matches of every type, so that the test
+        # above means something.
+    def test_sample_text_counts(self):
+        matches = cim_core.find_matches(cim_core.sample_text)
+        for tier in cim_core.tiers:
+            self.assertGreater(len(matches[tier]), 0, tier)
+
+    def test_edge_cases(self):
+        for text in edge_texts:
+            with self.subTest(text = text):
+                self.check_text(text)
+
+    # "CiM CIM" shares the space between the two, which counts toward both
+        # the more likely and the possible matches, just as it did when
+        # each regular expression was checked separately.
+    def test_overlap_between_types(self):
+        matches = cim_core.find_matches(" CiM CIM ")
+        self.assertEqual(matches["More Likely"], ["CiM"])
+        self.assertEqual(matches["Possible"], ["CIM"])
+
+    # A match never overlaps an earlier match for the same regular
+        # expression, so only every other "CiM" is found when they share
+        # the spaces between them.
+    def test_overlap_within_type(self):
+        matches = cim_core.find_matches(" CiM CiM CiM ")
+        self.assertEqual(matches["More Likely"], ["CiM", "CiM"])
+
+    def test_random_texts(self):
+        generator = random.Random(2026)
+        for i in range(2000):
+            text = random_text(generator)
+            with self.subTest(text = text):
+                self.check_text(text)
+
+    def test_sample_text_repeated(self):
+        self.check_text((cim_core.sample_text + " ") * 50)
+
+class CheckMatchesTest(unittest.TestCase):
+    # check_matches must fill in the same counts and match lists as it did
+        # with separate findall scans. The lists are compared as sets,
+        # since matches that only differ in case, such as "MEDcareers" and
+        # "MedCAREERS", can be listed in either order.
+    def test_sample_text(self):
+        for text in [cim_core.sample_text] + edge_texts:
+            with self.subTest(text = text):
+                expected = findall_matches(text)[1]
+                row = {}
+                cim_core.check_matches(text, row)
+                for tier in cim_core.tiers:
+                    self.assertEqual(row["Number of " + tier + " Matches"],
+                                     len(expected[tier]))
+                    listed = row[tier + " Matches"]
+                    self.assertEqual(set(filter(None, listed.split("; "))),
+                                     set(expected[tier]))
+
+class TallyMatchesTest(unittest.TestCase):
+    def test_order(self):
+        matches = {"More Likely": ["b", "CiM", "a", "CiM", "B"],
+                   "Possible": ["CIM", "b", "a", "CIM"],
+                   "Unlikely": []}
+        tallies = cim_core.tally_matches(matches)
+        # The more likely matches are listed from most to least common,
+            # and in alphabetical order when they are just as common.
+        self.assertEqual(tallies["More Likely"],
+                         [{"Match": "CiM", "Count": 2},
+                          {"Match": "a", "Count": 1},
+                          {"Match": "b", "Count": 1},
+                          {"Match": "B", "Count": 1}])
+        # The other matches are listed in alphabetical order.
+        self.assertEqual(tallies["Possible"],
+                         [{"Match": "a", "Count": 1},
+                          {"Match": "b", "Count": 1},
+                          {"Match": "CIM", "Count": 2}])
+        self.assertEqual(tallies["Unlikely"], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,283 @@
+#! python3
+# test_crawler.py
+
+"""
+These tests run cim-crawler.py against the small website saved in
+    fixtures/site, which is served from this computer while they run.
+    The website has a robots.txt file that keeps out one folder, a
+    sitemap index that lists a plain sitemap, a sitemap compressed with
+    gzip, and a sitemap that does not exist, and pages that link to each
+    other more deeply than max_depth allows. Its robots.txt file and
+    sitemaps give full URLs starting with http://127.0.0.1:8000, so the
+    tests copy the website to a temporary folder and change those URLs
+    to the address it is actually served at. Run the tests from the main
+    folder with "python -m unittest" or "python -m pytest"; they need the
+    same libraries as cim-crawler.py.
+
+The server also makes up a few faulty pages that a saved website cannot
+    have: a page that names an encoding that does not exist, and a page
+    whose download is cut off partway through."""
+
+# Import libraries.
+import contextlib
+import csv
+import functools
+import glob
+import gzip
+import http.server
+import importlib.util
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+# Make cim_core.py and cim_pdf.py importable from the main folder.
+tests_path = os.path.dirname(os.path.abspath(__file__))
+main_path = os.path.dirname(tests_path)
+sys.path.insert(0, main_path)
+
+import cim_core
+
+# Identify the saved website and the address its URLs are written for.
+site_path = os.path.join(tests_path, "fixtures", "site")
+saved_origin = b"http://127.0.0.1:8000"
+
+"""
+This function copies the saved website to destination, changing the
+    URLs in its robots.txt file and sitemaps to start with origin."""
+def copy_site(destination, origin):
+    shutil.copytree(site_path, destination)
+    for name in os.listdir(destination):
+        if name != "robots.txt" and ".xml" not in name:
+            continue
+        path = os.path.join(destination, name)
+        with open(path, "rb") as site_file:
+            data = site_file.read()
+        if name.endswith(".gz"):
+            data = gzip.compress(gzip.decompress(data).replace(
+                saved_origin, origin.encode("ascii")))
+        else:
+            data = data.replace(saved_origin, origin.encode("ascii"))
+        with open(path, "wb") as site_file:
+            site_file.write(data)
+
+"""
+This class serves files like http.server does, without printing a line
+    for each request."""
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+"""
+This class serves the saved website like QuietHandler, plus the faulty
+    pages. /faulty.html links to each of them and then to a page that
+    works, to show that the crawl goes on after them."""
+class FaultyHandler(QuietHandler):
+    def do_GET(self):
+        if self.path == "/faulty.html":
+            self.send_page("text/html; charset=utf-8",
+                           b"<title>Faulty Pages</title>"
+                           b"<a href=\"bogus-charset.html\">Bogus</a>"
+                           b"<a href=\"cut-short.html\">Cut short</a>"
+                           b"<a href=\"news.html\">News</a>")
+        elif self.path == "/bogus-charset.html":
+            self.send_page("text/html; charset=x-bogus",
+                           "<title>Caf\u00e9</title>Careers in Medicine"
+                           .encode("cp1252"))
+        # Promise a chunk of 1024 bytes, send only part of it, and hang up.
+        elif self.path == "/cut-short.html":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"400\r\n<title>Cut Short</title>")
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            super().do_GET()
+
+    def send_page(self, content_type, data):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+"""
+This function loads a fresh copy of cim-crawler.py, whose name cannot be
+    imported the usual way because of the hyphen, so that each test can
+    change its settings without affecting the others."""
+def load_crawler():
+    spec = importlib.util.spec_from_file_location(
+        "cim_crawler", os.path.join(main_path, "cim-crawler.py"))
+    crawler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(crawler)
+    return crawler
+
+class CrawlerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temporary = tempfile.TemporaryDirectory()
+        cls.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(
+                FaultyHandler, directory = os.path.join(cls.temporary.name,
+                                                       "site")))
+        cls.origin = "http://127.0.0.1:" + str(cls.server.server_port)
+        copy_site(os.path.join(cls.temporary.name, "site"), cls.origin)
+        cls.thread = threading.Thread(target = cls.server.serve_forever,
+                                      daemon = True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.temporary.cleanup()
+
+    # Crawl the website from the page at start with the settings given, and
+        # return the rows of the output file, keyed by the path of each
+        # page, and what the program printed.
+    def crawl(self, start = "/", **settings):
+        crawler = load_crawler()
+        crawler.host_delay = 0
+        crawler.request_timeout = 10
+        output_path = tempfile.mkdtemp(dir = self.temporary.name)
+        crawler.destination_path = output_path
+        for name, value in settings.items():
+            setattr(crawler, name, value)
+        printed = io.StringIO()
+        argv = ["cim-crawler.py", self.origin + start]
+        with unittest.mock.patch.object(sys, "argv", argv), \
+                contextlib.redirect_stdout(printed):
+            crawler.main()
+        crawler.session.close()
+        output_csvs = glob.glob(os.path.join(output_path, "cim-crawl_*.csv"))
+        self.assertEqual(len(output_csvs), 1)
+        with open(output_csvs[0], newline = "",
+                  encoding = "utf-8-sig") as output_file:
+            rows = list(csv.DictReader(output_file))
+        pages = {row["URL"][len(self.origin):]: row for row in rows}
+        self.assertEqual(len(pages), len(rows), "a page was checked twice")
+        return pages, printed.getvalue()
+
+    def test_whole_site(self):
+        pages, printed = self.crawl(max_depth = 3)
+        # The links to /index.html and to events.html with a tracking code
+            # lead to pages that were already found.
+        self.assertEqual(sorted(pages),
+                         ["/", "/advising.html", "/archive-1.html",
+                          "/archive-2.html", "/events.html", "/news.html",
+                          "/notes.txt", "/report.pdf",
+                          "/resources/checklist.html",
+                          "/resources/guide.html"])
+        # Pages come from the start page, the plain sitemap, the gzip
+            # sitemap, and links, including a link relative to a "base"
+            # tag.
+        self.assertEqual(pages["/"]["Found On"], "Start")
+        self.assertEqual(pages["/advising.html"]["Found On"], "Sitemap")
+        self.assertEqual(pages["/news.html"]["Found On"], "Sitemap")
+        self.assertEqual(pages["/resources/checklist.html"]["Found On"],
+                         self.origin + "/resources/guide.html")
+        self.assertIn("Could not read the sitemap " + self.origin +
+                      "/sitemap-missing.xml (404)", printed)
+        self.assertIn("Found 2 new pages in the sitemaps.", printed)
+        # Links are followed from pages up to max_depth links away from
+            # the start, so archive-2.html is checked but the page it
+            # links to is not.
+        self.assertEqual(pages["/events.html"]["Depth"], "1")
+        self.assertEqual(pages["/archive-1.html"]["Depth"], "2")
+        self.assertEqual(pages["/archive-2.html"]["Depth"], "3")
+        # The pages are checked like cim-scraper.py checks them.
+        self.assertEqual(pages["/"]["Scraped Title"], "Student Affairs")
+        self.assertEqual(pages["/"]["Number of More Likely Matches"], "1")
+        self.assertEqual(pages["/events.html"]["Scraped Title"],
+                         "Events & Workshops")
+        self.assertEqual(pages["/resources/guide.html"]
+                         ["More Likely Matches"],
+                         "Careers in Medicine; MedCAREERS")
+        self.assertEqual(pages["/advising.html"]["More Likely Matches"],
+                         "CiM")
+        self.assertEqual(pages["/news.html"]["Number of More Likely Matches"],
+                         "0")
+        for path, row in pages.items():
+            if path != "/report.pdf":
+                self.assertEqual(row["Content Status"], "Checked", path)
+        # A text file without a declared encoding is read as
+            # Windows-1252.
+        self.assertEqual(pages["/notes.txt"]["Number of More Likely Matches"],
+                         "1")
+        if cim_core.pdf_support:
+            self.assertTrue(pages["/report.pdf"]["Content Status"]
+                            .startswith("Checked"))
+            self.assertIn("Careers in Medicine",
+                          pages["/report.pdf"]["More Likely Matches"])
+        else:
+            self.assertEqual(pages["/report.pdf"]["Content Status"],
+                             "Skipped: PDF (pypdf is not installed)")
+
+    def test_depth_zero(self):
+        pages, printed = self.crawl(max_depth = 0)
+        self.assertEqual(sorted(pages), ["/", "/advising.html", "/news.html"])
+
+    def test_without_sitemaps(self):
+        pages, printed = self.crawl(max_depth = 1, use_sitemaps = False)
+        self.assertEqual(sorted(pages),
+                         ["/", "/events.html", "/notes.txt", "/report.pdf",
+                          "/resources/guide.html"])
+        self.assertNotIn("sitemap", printed)
+
+    def test_max_pages(self):
+        pages, printed = self.crawl(max_pages = 4)
+        self.assertEqual(len(pages), 4)
+        self.assertIn("Stopped after max_pages pages.", printed)
+
+    # The bytes of the sitemaps count toward max_total_bytes, so the crawl
+        # stops once the sitemaps alone have used up the budget.
+    def test_sitemap_bytes(self):
+        pages, printed = self.crawl(max_total_bytes = 1)
+        self.assertIn("Stopped reading the sitemaps after max_total_bytes "
+                      "bytes.", printed)
+        self.assertEqual(pages, {})
+        index_size = os.path.getsize(os.path.join(
+            self.temporary.name, "site", "sitemap_index.xml"))
+        downloaded = re.search(r"downloaded (\d+) bytes", printed)
+        self.assertGreaterEqual(int(downloaded.group(1)), index_size)
+
+    # With room for only two waiting pages, the sitemaps fill the frontier
+        # and pages found in links are left out until there is room.
+    def test_full_frontier(self):
+        pages, printed = self.crawl(max_frontier = 2)
+        self.assertIn("The sitemaps list more pages than max_frontier",
+                      printed)
+        self.assertIn("pages were left out because 2 pages were already "
+                      "waiting.", printed)
+        self.assertEqual(sorted(pages)[:2], ["/", "/advising.html"])
+
+    # A page that names an encoding that does not exist is read as
+        # Windows-1252, and a page whose download is cut off is recorded
+        # as an error. Neither stops the crawl.
+    def test_faulty_pages(self):
+        pages, printed = self.crawl("/faulty.html", max_depth = 1,
+                                    use_sitemaps = False)
+        self.assertEqual(sorted(pages),
+                         ["/bogus-charset.html", "/cut-short.html",
+                          "/faulty.html", "/news.html"])
+        bogus = pages["/bogus-charset.html"]
+        self.assertEqual(bogus["Content Status"], "Checked")
+        self.assertEqual(bogus["Scraped Title"], "Caf\u00e9")
+        self.assertEqual(bogus["Number of More Likely Matches"], "1")
+        cut_short = pages["/cut-short.html"]
+        self.assertEqual(cut_short["Content Status"],
+                         "Could not download the page")
+        self.assertTrue(cut_short["Scrape Response"]
+                        .startswith("ChunkedEncodingError: "))
+        self.assertEqual(cut_short["Number of More Likely Matches"], "")
+        self.assertEqual(pages["/news.html"]["Content Status"], "Checked")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#! python3
+# test_titles.py
+
+"""
+These tests check that get_title and get_title_from_bytes in cim_core.py
+    find the same titles as the programs did when they read each page with
+    BeautifulSoup and lxml. The pages are saved in fixtures/titles, and
+    fixtures/titles/titles.json lists the encoding of each page and the
+    title that BeautifulSoup found in it, polished up the old way. The
+    tests also check that the title is the same wherever the page is split
+    into chunks. Run them from the main folder with
+    "python -m unittest" or "python -m pytest"."""
+
+# Import libraries.
+import json
+import os
+import sys
+import unittest
+
+# Make cim_core.py importable from the main folder.
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(tests_path))
+
+import cim_core
+
+# Identify the folder with the saved pages, and load the list of titles.
+fixtures_path = os.path.join(tests_path, "fixtures", "titles")
+with open(os.path.join(fixtures_path, "titles.json"),
+          encoding = "utf-8") as titles_file:
+    expected_titles = json.load(titles_file)
+
+"""
+This function returns the bytes of a saved page and the page decoded as
+    text."""
+def load_page(name):
+    with open(os.path.join(fixtures_path, name), "rb") as page_file:
+        data = page_file.read()
+    return data, data.decode(expected_titles[name]["Encoding"])
+
+"""
+This function finds the title of a text by feeding it to a TitleParser in
+    the chunks given."""
+def chunked_title(chunks):
+    parser = cim_core.TitleParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.title()
+
+class TitleTest(unittest.TestCase):
+    def test_saved_pages(self):
+        for name, expected in expected_titles.items():
+            with self.subTest(page = name):
+                data, text = load_page(name)
+                self.assertEqual(cim_core.get_title(text), expected["Title"])
+
+    def test_saved_pages_as_bytes(self):
+        for name, expected in expected_titles.items():
+            with self.subTest(page = name):
+                data, text = load_page(name)
+                encoding = expected["Encoding"]
+                self.assertIsNotNone(cim_core.bytes_encoding(encoding))
+                self.assertEqual(cim_core.get_title_from_bytes(data,
+                                                               encoding),
+                                 expected["Title"])
+
+    # Split each page in two at every position, so that every tag,
+        # character reference, and run of spaces is split somewhere.
+    def test_split_pages(self):
+        for name, expected in expected_titles.items():
+            data, text = load_page(name)
+            # Only the first few thousand characters matter for long
+                # pages, since the title is near the beginning.
+            for i in range(min(len(text), 6000) + 1):
+                title = chunked_title([text[:i], text[i:]])
+                self.assertEqual(title, expected["Title"], (name, i))
+
+    def test_one_character_at_a_time(self):
+        for name, expected in expected_titles.items():
+            data, text = load_page(name)
+            self.assertEqual(chunked_title(text), expected["Title"], name)
+
+    # get_title and get_title_from_bytes read 4096 characters or bytes at a
+        # time. Move the title across the end of the first chunk one
+        # position at a time, so that the title tag, a character
+        # reference, and characters that take more than one byte are all
+        # split between chunks.
+    def test_title_across_chunks(self):
+        title = "Faculté &amp; 医学 – Careers in Medicine"
+        expected = "Faculté & 医学 – Careers in Medicine"
+        for padding in range(4000, 4100):
+            text = ("<html><head><!--" + "x" * padding + "--><title>" +
+                    title + "</title></head></html>")
+            with self.subTest(padding = padding):
+                self.assertEqual(cim_core.get_title(text), expected)
+                self.assertEqual(
+                    cim_core.get_title_from_bytes(text.encode("utf-8")),
+                    expected)
+
+if __name__ == "__main__":
+    unittest.main()